@@ -0,0 +1,314 @@
+import argparse
+import sys
+import time
+from datetime import date
+from itertools import chain
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generate_tracking_data as g
+
+np = g.np
+
+CYCLE_TYPES = ["daily", "weekly", "monthly", "annual"]
+GOAL_TYPES = ["positive", "negative"]
+DEFAULT_TARGETS = [0, 3, 1, 12]
+TOTALS = ["daily", "weekly", "monthly", "yearly"]
+REPORTS = ["week_report", "month_report", "year_report"]
+METRICS = TOTALS + ["streaks", "detailed_stats"] + REPORTS
+MINUTE_MS = 60 * 1000
+NO_CYCLE = -1
+
+def days_from_civil(y, m, d):
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+def day_numbers(keys):
+    raw = np.array(keys, dtype="S10").view(np.uint8).reshape(-1, 10).astype(np.int64) - 48
+    y = raw[:, 0] * 1000 + raw[:, 1] * 100 + raw[:, 2] * 10 + raw[:, 3]
+    return days_from_civil(y, raw[:, 5] * 10 + raw[:, 6], raw[:, 8] * 10 + raw[:, 9])
+
+def day_number(d):
+    return d.toordinal() - g.EPOCH_ORDINAL
+
+def iso_day(n):
+    return date.fromordinal(n + g.EPOCH_ORDINAL).isoformat()
+
+class Backup:
+    __slots__ = ("ids", "names", "colors", "track_time", "cycle", "goal", "target", "has_target",
+                 "s_habit", "s_day", "s_ms", "s_min", "c_habit", "c_day")
+
+    def __init__(self, habits):
+        self.ids = [h.get("id") for h in habits]
+        self.names = [h.get("name") for h in habits]
+        self.colors = [h.get("colorValue") for h in habits]
+        self.track_time = np.array([bool(h.get("trackTime")) for h in habits], dtype=bool)
+        self.cycle = np.array([NO_CYCLE if h.get("cycleType") is None else h["cycleType"] for h in habits],
+                              dtype=np.int64)
+        self.goal = np.array([h.get("goalType") or 0 for h in habits], dtype=np.int64)
+        targets = [h.get("targetDays") for h in habits]
+        self.has_target = np.array([t is not None for t in targets], dtype=bool)
+        self.target = np.array([DEFAULT_TARGETS[c] if t is None and 0 <= c < 4 else t or 0
+                                for t, c in zip(targets, self.cycle.tolist())], dtype=np.int64)
+        s_keys, s_lens, s_values, s_per = [], [], [], []
+        c_keys, c_per = [], []
+        for h in habits:
+            td = h.get("trackingDurations") or {}
+            lens = [len(v) for v in td.values()]
+            s_keys.extend(td)
+            s_lens.extend(lens)
+            s_values.append(td.values())
+            s_per.append(sum(lens))
+            done = [k for k, v in (h.get("dailyCompletionStatus") or {}).items() if v is True]
+            c_keys.extend(done)
+            c_per.append(len(done))
+        index = np.arange(len(habits), dtype=np.int64)
+        self.s_habit = np.repeat(index, s_per)
+        self.s_day = np.repeat(day_numbers(s_keys), s_lens)
+        self.s_ms = np.fromiter(chain.from_iterable(chain.from_iterable(s_values)), dtype=np.int64,
+                                count=len(self.s_habit))
+        self.s_min = self.s_ms // MINUTE_MS
+        self.c_habit = np.repeat(index, c_per)
+        self.c_day = day_numbers(c_keys)
+
+def week_start(days):
+    return days - (days + 3) % 7
+
+def unit_start(unit):
+    return lambda days: days.astype("datetime64[D]").astype(f"datetime64[{unit}]").astype(
+        "datetime64[D]").astype(np.int64)
+
+PERIODS = {
+    "daily": (lambda days: days, "D"),
+    "weekly": (week_start, "D"),
+    "monthly": (unit_start("M"), "M"),
+    "yearly": (unit_start("Y"), "Y"),
+}
+
+def labels(days, unit):
+    return np.datetime_as_string(days.astype("datetime64[D]").astype(f"datetime64[{unit}]")).tolist()
+
+def split_by_habit(b, habit, cols):
+    bounds = np.searchsorted(habit, np.arange(len(b.ids) + 1)).tolist()
+    return {hid: {c: v[bounds[i]:bounds[i + 1]] for c, v in cols.items()} for i, hid in enumerate(b.ids)}
+
+def dense_keys(keys, size):
+    if size <= 4 * len(keys) + 4096:
+        present = np.zeros(size, dtype=bool)
+        present[keys] = True
+        groups = np.flatnonzero(present)
+        lookup = np.cumsum(present) - 1
+        return groups, lookup[keys]
+    return np.unique(keys, return_inverse=True)
+
+def totals(b, period):
+    bucket, unit = PERIODS[period]
+    sb, cb = bucket(b.s_day), bucket(b.c_day)
+    both = np.concatenate([sb, cb])
+    lo = int(both.min()) if len(both) else 0
+    span = int(both.max()) - lo + 1 if len(both) else 1
+    keys, inv = dense_keys(np.concatenate([b.s_habit * span + sb - lo, b.c_habit * span + cb - lo]),
+                           len(b.ids) * span)
+    n, k = len(sb), len(keys)
+    cols = {
+        "period": labels(keys % span + lo, unit),
+        "sessions": np.bincount(inv[:n], minlength=k).tolist(),
+        "minutes": np.bincount(inv[:n], weights=b.s_min, minlength=k).astype(np.int64).tolist(),
+        "duration_ms": np.bincount(inv[:n], weights=b.s_ms, minlength=k).astype(np.int64).tolist(),
+        "completions": np.bincount(inv[n:], minlength=k).tolist(),
+    }
+    return split_by_habit(b, keys // span, cols)
+
+def streaks(b, today):
+    count = len(b.ids)
+    longest = np.zeros(count, dtype=np.int64)
+    current = np.zeros(count, dtype=np.int64)
+    last = np.full(count, -1, dtype=np.int64)
+    days = np.zeros(count, dtype=np.int64)
+    if len(b.c_day):
+        lo = int(b.c_day.min())
+        span = int(b.c_day.max()) - lo + 1
+        keys = dense_keys(b.c_habit * span + b.c_day - lo, count * span)[0]
+        h, d = keys // span, keys % span + lo
+        starts = np.ones(len(keys), dtype=bool)
+        starts[1:] = (h[1:] != h[:-1]) | (d[1:] - d[:-1] != 1)
+        first = np.flatnonzero(starts)
+        end = np.append(first[1:] - 1, len(keys) - 1)
+        run_h, run_start, run_end = h[first], d[first], d[end]
+        heads = np.flatnonzero(np.append(True, run_h[1:] != run_h[:-1]))
+        longest[run_h[heads]] = np.maximum.reduceat(run_end - run_start + 1, heads)
+        live = (run_start <= today) & (run_end >= today - 1)
+        current[run_h[live]] = np.minimum(run_end[live], today) - run_start[live] + 1
+        last[run_h] = run_end
+        days = np.bincount(h, minlength=count)
+    return {hid: {"longest": lg, "current": cur, "completed_days": n, "last_completed": iso_day(ld) if ld >= 0 else None}
+            for hid, lg, cur, n, ld in zip(b.ids, longest.tolist(), current.tolist(), days.tolist(), last.tolist())}
+
+def completions_between(b, start, end):
+    mask = (b.c_day >= start) & (b.c_day <= end)
+    return np.bincount(b.c_habit[mask], minlength=len(b.ids))
+
+def minutes_between(b, start, end):
+    mask = (b.s_day >= start) & (b.s_day <= end)
+    return np.bincount(b.s_habit[mask], weights=b.s_min[mask], minlength=len(b.ids)).astype(np.int64)
+
+def detailed_stats(b, today):
+    t = day_number(today)
+    week, month = t - today.weekday(), day_number(today.replace(day=1))
+    year_days = t - day_number(date(today.year, 1, 1)) + 1
+    return {
+        "totalHabits": len(b.ids),
+        "completedWeekTasks": int(completions_between(b, week, t).sum()),
+        "totalWeekDays": len(b.ids) * (today.weekday() + 1),
+        "completedMonthTasks": int(completions_between(b, month, t).sum()),
+        "totalMonthDays": today.day,
+        "completedYearTasks": int(completions_between(b, t - year_days + 1, t).sum()),
+        "totalYearTasks": len(b.ids) * year_days,
+    }
+
+def known_cycle(b):
+    return (b.cycle >= 0) & (b.cycle < len(CYCLE_TYPES))
+
+def period_completion(b, start, end):
+    s, e = day_number(start), day_number(end)
+    span = e - s
+    count = len(b.ids)
+    mask = (b.c_day >= s) & (b.c_day <= e)
+    ch = b.c_habit[mask]
+    done = np.bincount(ch, minlength=count)
+    chunks = span // 7 + 1
+    per_week = np.bincount(ch * chunks + (b.c_day[mask] - s) // 7, minlength=count * chunks).reshape(count, chunks)
+    weekly_done = np.minimum(per_week, b.target[:, None]).sum(axis=1)
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    required = np.select(
+        [b.cycle == 0, b.cycle == 1, b.cycle == 2, b.cycle == 3],
+        [np.full(count, span + 1), -(-span // 7) * b.target, months * b.target, -(-(b.target * (span + 1)) // 365)],
+        0,
+    )
+    completed = np.where(b.cycle == 1, weekly_done, np.where(known_cycle(b), done, 0))
+    rate = completed / np.maximum(required, 1)
+    return completed, required, np.where(required > 0, rate, 0.0)
+
+def group_rates(codes, names, rate, finished):
+    habits = np.bincount(codes, minlength=len(names))
+    total = np.bincount(codes, weights=rate, minlength=len(names))
+    done = np.bincount(codes, weights=finished, minlength=len(names)).astype(np.int64)
+    return {name: {"habits": int(habits[i]), "completedHabits": int(done[i]),
+                   "averageCompletionRate": float(total[i] / habits[i]) if habits[i] else 0.0}
+            for i, name in enumerate(names)}
+
+def report(b, cycle, start, end):
+    completed, required, rate = period_completion(b, start, end)
+    goal = [{"name": b.names[i], "completedDays": int(completed[i]), "requiredDays": int(required[i]),
+             "completionRate": float(rate[i]), "color": b.colors[i]} for i in np.flatnonzero(b.has_target).tolist()]
+    eligible = known_cycle(b) & (b.cycle <= (1 if cycle == "weekly" else 3))
+    completed, required, rate = completed * eligible, required * eligible, rate * eligible
+    finished = rate >= 1.0
+    known = known_cycle(b)
+    detailed = {}
+    total_rate = 0.0
+    for name, c, r, x, f in zip(b.names, completed.tolist(), required.tolist(), rate.tolist(), finished.tolist()):
+        detailed[name] = {"habitName": name, "totalRequiredDays": r, "completedDays": c, "completionRate": x,
+                          "isCompleted": f}
+        total_rate += x
+    ranked = sorted((item for item in detailed.items() if item[1]["completionRate"] > 0),
+                    key=lambda item: -item[1]["completionRate"])
+    doc = {
+        "startDate": start.isoformat(),
+        "endDate": end.isoformat(),
+        "cycleType": cycle,
+        "totalHabits": len(b.ids),
+        "completedHabits": int(finished.sum()),
+        "averageCompletionRate": total_rate / len(b.ids) if b.ids else 0.0,
+        "topHabits": {name: stats["completionRate"] for name, stats in ranked[:3]},
+        "detailedCompletion": detailed,
+        "goalCompletion": goal,
+        "byCycleType": group_rates(b.cycle[known], CYCLE_TYPES, rate[known], finished[known]),
+        "byGoalType": group_rates(np.clip(b.goal, 0, 1), GOAL_TYPES, rate, finished),
+    }
+    if cycle != "weekly":
+        s, e = day_number(start), day_number(end)
+        counts = completions_between(b, s, e).tolist()
+        minutes = minutes_between(b, s, e).tolist()
+        doc["completionCounts"] = dict(zip(b.names, counts))
+        doc["completionMinutes"] = {name: m for name, m, t in zip(b.names, minutes, b.track_time.tolist()) if t and m > 0}
+    return doc
+
+def report_periods(today, year, month):
+    monday = date.fromordinal(today.toordinal() - today.weekday())
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return {
+        "week_report": ("weekly", monday, date.fromordinal(monday.toordinal() + 6)),
+        "month_report": ("monthly", date(year, month, 1), date.fromordinal(next_month.toordinal() - 1)),
+        "year_report": ("annual", date(year, 1, 1), date(year, 12, 31)),
+    }
+
+def run(path, today, year, month, only=None):
+    timing = {}
+    metrics = {}
+
+    def timed(name, fn, *a):
+        t = time.perf_counter()
+        result = fn(*a)
+        timing[name] = (time.perf_counter() - t) * 1000
+        return result
+
+    data = timed("load", g.load_json, path)
+    b = timed("arrays", Backup, data.get("habits", []))
+    periods = report_periods(today, year, month)
+    jobs = {name: (totals, b, name) for name in TOTALS}
+    jobs["streaks"] = (streaks, b, day_number(today))
+    jobs["detailed_stats"] = (detailed_stats, b, today)
+    jobs.update({name: (report, b, *periods[name]) for name in REPORTS})
+    for name in METRICS:
+        if only and name not in only:
+            continue
+        fn, *a = jobs[name]
+        metrics[name] = timed(name, fn, *a)
+    return {
+        "source": str(path),
+        "today": today.isoformat(),
+        "year": year,
+        "month": month,
+        "habits": len(b.ids),
+        "sessions": len(b.s_ms),
+        "checkins": len(b.c_day),
+        "numpy": np.__version__,
+        "metrics": metrics,
+        "timing_ms": {k: round(v, 3) for k, v in timing.items()},
+    }
+
+def latest_backup(root):
+    found = sorted(Path(root).glob("contrail_backup_*.json"), key=lambda p: p.stat().st_mtime)
+    if not found:
+        raise SystemExit(f"no contrail_backup_*.json in {root}")
+    return found[-1]
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--backup", default=None)
+    p.add_argument("--out", default="backup_stats.json")
+    p.add_argument("--today", default=None)
+    p.add_argument("--year", type=int, default=None)
+    p.add_argument("--month", type=int, default=None)
+    p.add_argument("--only", nargs="+", choices=METRICS, default=None)
+    p.add_argument("--indent", type=int, default=None)
+    args = p.parse_args()
+    if np is None:
+        raise SystemExit("backup_stats requires numpy to be installed")
+    today = date.fromisoformat(args.today) if args.today else date.today()
+    path = Path(args.backup) if args.backup else latest_backup(Path.cwd())
+    doc = run(path, today, args.year or today.year, args.month or today.month, args.only)
+    t = time.perf_counter()
+    g.save_json(args.out, doc, indent=args.indent)
+    doc["timing_ms"]["save"] = round((time.perf_counter() - t) * 1000, 3)
+    for name, ms in doc["timing_ms"].items():
+        print(f"STATS {name:<16} {ms:10.2f} ms")
+    print(f"STATS_OK {args.out} habits={doc['habits']} sessions={doc['sessions']} checkins={doc['checkins']}")
+
+if __name__ == "__main__":
+    main()
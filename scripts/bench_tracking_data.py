@@ -0,0 +1,256 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generate_tracking_data as g
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+
+FULL_AXES = {
+    "sessions": [30, 120, 480],
+    "months": [12, 36],
+    "habits": [10, 50],
+    "weekend_caps": [(3, 3), (2, 6)],
+}
+
+QUICK_AXES = {
+    "sessions": [30, 120],
+    "months": [12],
+    "habits": [10],
+    "weekend_caps": [(3, 3)],
+}
+
+MIN_TIME = 0.05
+STAGE_BUDGET = 5.0
+REFERENCE = timeit.Timer("sum(range(1000))")
+REFERENCE_LOOPS = 200
+
+def loops_for(timer, min_time):
+    i = 1
+    while True:
+        for j in (1, 2, 5):
+            t = timer.timeit(i * j)
+            if t >= min_time:
+                return i * j, t
+        i *= 10
+
+def timed(fn, repeat, min_time=MIN_TIME):
+    timer = timeit.Timer(fn)
+    number, probe = loops_for(timer, min_time)
+    repeat = max(1, min(repeat, max(3, int(STAGE_BUDGET / probe))))
+    samples = [probe / number]
+    ref = [REFERENCE.timeit(REFERENCE_LOOPS) / REFERENCE_LOOPS]
+    for _ in range(repeat - 1):
+        samples.append(timer.timeit(number) / number)
+        ref.append(REFERENCE.timeit(REFERENCE_LOOPS) / REFERENCE_LOOPS)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "ref_s": min(ref), "repeat": repeat,
+            "number": number}
+
+def caps_for(sessions, weekend_caps):
+    weekday_cap = max(2, -(-sessions * 2 // 31))
+    return weekday_cap, max(weekend_caps[1], weekday_cap + 1)
+
+BENCH_PROFILE = [[[1.0] * 7 + [2.0] * 3 + [1.0] * 8 + [4.0] * 5 + [1.0], [1.0] * 60] for _ in range(7)]
+
+def bench_stages(axes, repeat, min_time):
+    days = g.month_days(2024, 3)
+    rng = random.Random(1)
+    np_rng = g.np.random.default_rng(1) if g.np is not None else None
+    np_state = np_rng.bit_generator.state if np_rng is not None else None
+    tables = g.compile_hour_profile(BENCH_PROFILE)
+    results = []
+
+    def add(stage, label, fn):
+        def call():
+            rng.seed(1)
+            if np_rng is not None:
+                np_rng.bit_generator.state = np_state
+            fn()
+
+        results.append(dict(stage=stage, case=label, **timed(call, repeat, min_time)))
+
+    for sessions in axes["sessions"]:
+        for lo, hi in axes["weekend_caps"]:
+            weekday_cap, weekend_cap = caps_for(sessions, (lo, hi))
+            lo, hi = max(lo, weekday_cap), max(hi, weekday_cap + 1)
+            label = f"sessions={sessions},weekend_cap={lo}-{hi}"
+
+            def legacy():
+                alloc = g.allocate_sessions(sessions, days, weekday_cap, weekend_cap, shuffle=True,
+                                            min_weekend_per_day=1, weekend_cap_min=lo, weekend_cap_max=hi, rng=rng)
+                return g.rebalance_alloc(alloc, days, weekday_cap, weekend_cap)
+
+            add("allocate_sessions", label, lambda: g.allocate_sessions(
+                sessions, days, weekday_cap, weekend_cap, shuffle=True, min_weekend_per_day=1,
+                weekend_cap_min=lo, weekend_cap_max=hi, rng=rng))
+            alloc = g.allocate_sessions(sessions, days, weekday_cap, weekend_cap, rng=rng,
+                                        weekend_cap_min=lo, weekend_cap_max=hi)
+            add("rebalance_alloc", label, lambda: g.rebalance_alloc(
+                dict(alloc), days, weekday_cap, weekend_cap, max_weekend_ratio=0.3))
+            add("allocate_legacy", label, legacy)
+            add("allocate_exact", label, lambda: g.allocate_exact(
+                sessions, days, weekday_cap, weekend_cap, shuffle=True, min_weekend_per_day=1,
+                weekend_cap_min=lo, weekend_cap_max=hi, max_weekend_ratio=0.6, rng=rng))
+        per_day = [(d, n) for d, n in g.allocate_exact(sessions, days, *caps_for(sessions, (3, 3))).items() if n]
+        total_ms = sessions * 40 * 60 * 1000
+        label = f"sessions={sessions}"
+        add("jittered_durations", label, lambda: g.jittered_durations(total_ms, sessions, rng=rng))
+        add("gen_day_times", label, lambda: [g.fmt_iso(t) for d, n in per_day for t in g.gen_day_times(d, n, rng=rng)])
+        add("profile_day_times", label, lambda: [g.fmt_iso(t) for d, n in per_day
+                                                 for t in g.profile_day_times(d, n, tables, rng=rng)])
+        if g.np is not None:
+            add("np_generate_sessions", label, lambda: g.np_generate_sessions(per_day, total_ms, sessions, rng=np_rng))
+            add("np_generate_profile", label, lambda: g.np_generate_sessions(
+                per_day, total_ms, sessions, rng=np_rng, hour_profile=BENCH_PROFILE))
+    return results
+
+def write_fixture(root, habits, months, sessions):
+    years = -(-months // 12)
+    data, agg_map = g.scale_fixture(habits=habits, years=years, start_year=2020, sessions_per_month=sessions,
+                                    checkins_per_month=min(sessions, 25), weekday_cap=caps_for(sessions, (3, 3))[0],
+                                    weekend_cap=caps_for(sessions, (3, 3))[1], seed=1)
+    agg = {"habits": [{"id": h["id"], "name": h["name"], "months": dict(list(agg_map[h["id"]].items())[:months])}
+                      for h in data["habits"]]}
+    src = root / "source.json"
+    aggp = root / "aggregates.json"
+    g.save_json(src, data)
+    g.save_json(aggp, agg)
+    return src, aggp
+
+def bench_process(axes, repeat, min_time, root):
+    results = []
+    for habits in axes["habits"]:
+        for months in axes["months"]:
+            for sessions in axes["sessions"]:
+                src, aggp = write_fixture(root, habits, months, sessions)
+                for lo, hi in axes["weekend_caps"]:
+                    weekday_cap, weekend_cap = caps_for(sessions, (lo, hi))
+                    lo, hi = max(lo, weekday_cap), max(hi, weekday_cap + 1)
+                    label = f"habits={habits},months={months},sessions={sessions},weekend_cap={lo}-{hi}"
+                    for mode, kw in (("process", {}), ("process_stream", {"stream": True}),
+                                     ("process_compact", {"indent": None})):
+                        out = root / mode
+
+                        def run():
+                            with contextlib.redirect_stdout(io.StringIO()):
+                                g.process(str(src), str(aggp), str(out), weekday_cap=weekday_cap,
+                                          weekend_cap=weekend_cap, weekend_cap_min=lo, weekend_cap_max=hi,
+                                          seed=1, **kw)
+
+                        results.append(dict(stage=mode, case=label, **timed(run, repeat, min_time)))
+                    generated = g.load_json(next((root / "process").glob("*.json")))
+                    for mode in ("process", "process_stream", "process_compact"):
+                        for f in (root / mode).glob("*.json"):
+                            f.unlink()
+                    for stage, indent in (("json_dump_indent4", 4), ("json_dump_compact", None)):
+                        target = root / f"{stage}.json"
+                        results.append(dict(stage=stage, case=label,
+                                            **timed(lambda: g.save_json(target, generated, indent=indent), repeat, min_time)))
+    return results
+
+def bench_codec(axes, repeat, min_time, root):
+    results = []
+    backends = [b for b in g.JSON_BACKENDS if b != "orjson" or g.orjson is not None]
+    current = g.JSON_BACKEND
+    for habits in axes["habits"]:
+        for sessions in axes["sessions"]:
+            src, aggp = write_fixture(root, habits, max(axes["months"]), sessions)
+            out = root / "codec"
+            g.set_json_backend(current)
+            with contextlib.redirect_stdout(io.StringIO()):
+                g.process(str(src), str(aggp), str(out), seed=1, weekday_cap=caps_for(sessions, (3, 3))[0],
+                          weekend_cap=caps_for(sessions, (3, 3))[1])
+            backup = next(out.glob("*.json"))
+            data = g.load_json(backup)
+            label = f"habits={habits},sessions={sessions},bytes={backup.stat().st_size}"
+            try:
+                for backend in backends:
+                    g.set_json_backend(backend)
+                    results.append(dict(stage=f"codec_load_{backend}", case=label,
+                                        **timed(lambda: g.load_json(backup), repeat, min_time)))
+                    for mode, indent, ensure_ascii in (("indent4", 4, False), ("compact", None, False),
+                                                       ("ascii", 4, True)):
+                        target = root / f"codec_{mode}.json"
+                        results.append(dict(stage=f"codec_dump_{mode}_{backend}", case=label, **timed(
+                            lambda: g.save_json(target, data, indent=indent, ensure_ascii=ensure_ascii), repeat, min_time)))
+            finally:
+                g.set_json_backend(current)
+                backup.unlink()
+    return results
+
+def compare(results, baseline, threshold):
+    base = {(r["stage"], r["case"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get((r["stage"], r["case"]))
+        if not b or b["min_s"] <= 0:
+            continue
+        ratio = r["min_s"] / b["min_s"]
+        if b.get("ref_s"):
+            ratio *= b["ref_s"] / r["ref_s"]
+        r["baseline_min_s"] = b["min_s"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(r)
+    return regressions
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--quick", action="store_true")
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--only", choices=["stages", "process", "codec"], default=None)
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    p.add_argument("--threshold", type=float, default=0.2)
+    p.add_argument("--min_time", type=float, default=MIN_TIME)
+    p.add_argument("--update_baseline", action="store_true")
+    args = p.parse_args()
+    axes = QUICK_AXES if args.quick else FULL_AXES
+    results = []
+    if args.only in (None, "stages"):
+        results.extend(bench_stages(axes, args.repeat, args.min_time))
+    if args.only in (None, "process"):
+        with tempfile.TemporaryDirectory() as tmp:
+            results.extend(bench_process(axes, args.repeat, args.min_time, Path(tmp)))
+    if args.only in (None, "codec"):
+        with tempfile.TemporaryDirectory() as tmp:
+            results.extend(bench_codec(axes, args.repeat, args.min_time, Path(tmp)))
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if baseline_path.exists() and not args.update_baseline:
+        regressions = compare(results, g.load_json(baseline_path), args.threshold)
+    doc = {
+        "created": int(time.time()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": g.np.__version__ if g.np is not None else None,
+        "orjson": g.orjson.__version__ if g.orjson is not None else None,
+        "axes": {k: [list(v) if isinstance(v, tuple) else v for v in vs] for k, vs in axes.items()},
+        "threshold": args.threshold,
+        "results": results,
+        "regressions": [{"stage": r["stage"], "case": r["case"], "ratio": r["ratio"]} for r in regressions],
+    }
+    g.save_json(args.out, doc)
+    if args.update_baseline:
+        g.save_json(baseline_path, doc)
+    for r in results:
+        extra = f"  x{r['ratio']}" if "ratio" in r else ""
+        print(f"{r['stage']:<26} {r['case']:<56} {r['min_s'] * 1000:10.3f} ms{extra}")
+    if regressions:
+        print("BENCH_REGRESSION " + json.dumps(doc["regressions"], ensure_ascii=False))
+        raise SystemExit(1)
+    print("BENCH_OK " + args.out)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,317 @@
 import argparse
+import contextlib
+import hashlib
+import heapq
+import io
 import json
+import mmap
+import os
 import random
+import re
+import sys
+import tempfile
 import time
+import uuid
 import calendar
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from datetime import datetime, date, timedelta
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SESSION_CAP_MS = 69 * 60 * 1000
+WEEKEND_HOURS = list(range(9, 24))
+MIDDAY_HOURS = [12, 13]
+EVENING_HOURS = [18, 19, 20, 21, 22, 23]
+
+JSON_BACKENDS = ("orjson", "json")
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+MMAP_MIN_BYTES = 1 << 20
+
+def set_json_backend(name):
+    global JSON_BACKEND
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name not in JSON_BACKENDS:
+        raise SystemExit(f"unknown json backend {name!r}")
+    if name == "orjson" and orjson is None:
+        raise SystemExit("json backend 'orjson' requires orjson to be installed")
+    JSON_BACKEND = name
+
+def json_separators(indent):
+    return (",", ": ") if indent is not None else (",", ":")
+
+def reindent(s, indent):
+    depth = 1
+    while "\n" + "  " * (depth + 1) in s:
+        depth += 1
+    for k in range(depth, 0, -1):
+        s = s.replace("\n" + "  " * k, "\n" + "\x00" * k)
+    return s.replace("\x00", " " * indent)
+
+def encode_json(v, indent=None, ensure_ascii=False):
+    if JSON_BACKEND == "orjson" and not ensure_ascii and (indent is None or indent > 0):
+        try:
+            s = orjson.dumps(v, option=orjson.OPT_INDENT_2 if indent is not None else 0).decode("utf-8")
+        except TypeError:
+            s = None
+        if s is not None:
+            return reindent(s, indent) if indent is not None and indent != 2 else s
+    return json.dumps(v, ensure_ascii=ensure_ascii, indent=indent, separators=json_separators(indent))
+
+def decode_json(raw):
+    if JSON_BACKEND == "orjson":
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    if not isinstance(raw, (str, bytes)):
+        raw = bytes(raw)
+    return json.loads(raw)
+
 def load_json(p):
-    with open(p, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(p, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            return decode_json(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return decode_json(view)
+            finally:
+                view.release()
 
-def save_json(p, data):
+def save_json(p, data, indent=4, ensure_ascii=False):
     with open(p, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.write(encode_json(data, indent=indent, ensure_ascii=ensure_ascii))
+
+def dump_value(v, indent, depth, ensure_ascii=False):
+    s = encode_json(v, indent=indent, ensure_ascii=ensure_ascii)
+    if indent is not None and depth:
+        s = s.replace("\n", "\n" + " " * (indent * depth))
+    return s
+
+def item_prefix(first, indent, depth):
+    sep = "" if first else ","
+    if indent is None:
+        return sep
+    return sep + "\n" + " " * (indent * depth)
+
+def close_prefix(empty, indent, depth):
+    if empty or indent is None:
+        return ""
+    return "\n" + " " * (indent * depth)
+
+class SpooledObject:
+    SPOOL_MAX = 1 << 20
+
+    def __init__(self, indent, depth, ensure_ascii=False):
+        self.indent = indent
+        self.depth = depth
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        self.buf = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX, mode="w+", encoding="utf-8")
+
+    def add(self, obj):
+        if not obj:
+            return
+        body = dump_value(obj, self.indent, self.depth, self.ensure_ascii)[1:-1]
+        if self.indent is not None:
+            body = body[:-(1 + self.indent * self.depth)]
+        if self.count:
+            body = "," + body
+        self.buf.write(body)
+        self.count += len(obj)
+
+    def copy_to(self, f):
+        f.write("{")
+        self.buf.seek(0)
+        while True:
+            chunk = self.buf.read(1 << 16)
+            if not chunk:
+                break
+            f.write(chunk)
+        f.write(close_prefix(self.count == 0, self.indent, self.depth) + "}")
+
+    def close(self):
+        self.buf.close()
+
+def habit_keys(h):
+    keys = list(h.keys())
+    for k in ("trackingDurations", "dailyCompletionStatus"):
+        if k not in h:
+            keys.append(k)
+    return keys
+
+def write_habit(f, h, month_results, indent, depth, ensure_ascii=False):
+    kv = ": " if indent is not None else ":"
+    td = SpooledObject(indent, depth + 1, ensure_ascii)
+    dcs = SpooledObject(indent, depth + 1, ensure_ascii)
+    try:
+        for _, mtd, mdcs in month_results:
+            td.add(mtd)
+            dcs.add(mdcs)
+        f.write("{")
+        for ki, k in enumerate(habit_keys(h)):
+            f.write(item_prefix(ki == 0, indent, depth + 1) + json.dumps(k, ensure_ascii=ensure_ascii) + kv)
+            if k == "trackingDurations":
+                td.copy_to(f)
+            elif k == "dailyCompletionStatus":
+                dcs.copy_to(f)
+            else:
+                f.write(dump_value(h[k], indent, depth + 1, ensure_ascii))
+        f.write(close_prefix(False, indent, depth) + "}")
+    finally:
+        td.close()
+        dcs.close()
+
+def stream_backup(out_path, data, gen_habit, indent=4, ensure_ascii=False):
+    kv = ": " if indent is not None else ":"
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for ti, (tk, tv) in enumerate(data.items()):
+            f.write(item_prefix(ti == 0, indent, 1) + json.dumps(tk, ensure_ascii=ensure_ascii) + kv)
+            if tk != "habits" or not isinstance(tv, list):
+                f.write(dump_value(tv, indent, 1, ensure_ascii))
+                continue
+            f.write("[")
+            for hi, h in enumerate(tv):
+                month_results = gen_habit(h)
+                f.write(item_prefix(hi == 0, indent, 2))
+                write_habit(f, h, month_results, indent, 2, ensure_ascii)
+            f.write(close_prefix(len(tv) == 0, indent, 1) + "]")
+        f.write(close_prefix(len(data) == 0, indent, 0) + "}")
+
+class ShardFile:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "wb")
+        self.offset = 0
+        self.records = 0
+        self.sha = hashlib.sha256()
+        self.span = None
+
+    def begin(self):
+        self.span = (self.offset, hashlib.sha256())
+
+    def write(self, s):
+        b = s.encode("utf-8")
+        self.f.write(b)
+        self.sha.update(b)
+        if self.span is not None:
+            self.span[1].update(b)
+        self.offset += len(b)
+
+    def line(self, obj):
+        self.write(encode_json(obj) + "\n")
+        self.records += 1
+
+    def end(self):
+        start, sha = self.span
+        self.span = None
+        return {"offset": start, "length": self.offset - start, "sha256": sha.hexdigest()}
+
+    def close(self):
+        self.f.close()
+        return {"file": self.path.name, "records": self.records, "bytes": self.offset,
+                "sha256": self.sha.hexdigest()}
+
+def counted(month_results, stats):
+    for mk, td, dcs in month_results:
+        stats["months"] += 1
+        stats["sessions"] += len(td)
+        stats["checkins"] += len(dcs)
+        yield mk, td, dcs
+
+def write_shards(out_dir, data, gen_habit, shards=4, shard_by="habit"):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = [ShardFile(out_dir / f"shard-{i:05d}.ndjson") for i in range(max(1, shards))]
+    habits_index = []
+    try:
+        for hi, h in enumerate(data.get("habits", [])):
+            sf = files[hi % len(files)]
+            stats = {"months": 0, "sessions": 0, "checkins": 0}
+            month_results = counted(gen_habit(h), stats)
+            sf.begin()
+            if shard_by == "habit":
+                sf.write('{"type":"habit","habit":')
+                write_habit(sf, h, month_results, None, 0)
+                sf.write("}\n")
+                sf.records += 1
+            else:
+                skeleton = {k: h[k] for k in habit_keys(h) if k in h}
+                skeleton["trackingDurations"] = {}
+                skeleton["dailyCompletionStatus"] = {}
+                sf.line({"type": "habit", "habit": skeleton})
+                for mk, mtd, mdcs in month_results:
+                    sf.line({"type": "month", "id": h.get("id"), "month": mk,
+                             "trackingDurations": mtd, "dailyCompletionStatus": mdcs})
+            entry = dict({"id": h.get("id"), "name": h.get("name"), "shard": hi % len(files)}, **stats)
+            entry.update(sf.end())
+            habits_index.append(entry)
+    finally:
+        shard_info = [sf.close() for sf in files]
+    manifest = {
+        "format": "contrail-ndjson",
+        "version": 1,
+        "shard_by": shard_by,
+        "keys": list(data.keys()),
+        "meta": {k: v for k, v in data.items() if k != "habits"},
+        "shards": shard_info,
+        "habits": habits_index,
+        "counts": {
+            "habits": len(habits_index),
+            "sessions": sum(e["sessions"] for e in habits_index),
+            "checkins": sum(e["checkins"] for e in habits_index),
+        },
+    }
+    manifest_path = out_dir / "manifest.json"
+    save_json(manifest_path, manifest)
+    return manifest_path
+
+def read_shard_habit(shard_dir, entry, verify=True):
+    with open(shard_dir / f"shard-{entry['shard']:05d}.ndjson", "rb") as f:
+        f.seek(entry["offset"])
+        raw = f.read(entry["length"])
+    if verify and hashlib.sha256(raw).hexdigest() != entry["sha256"]:
+        raise ValueError(f"checksum mismatch for habit {entry['id']}")
+    return [decode_json(line) for line in raw.splitlines() if line]
+
+def unshard(manifest_path, out_path, indent=4, verify=True):
+    manifest_path = Path(manifest_path)
+    manifest = load_json(manifest_path)
+    shard_dir = manifest_path.parent
+    entries = manifest["habits"]
+    data = {}
+    for k in manifest["keys"]:
+        data[k] = [{} for _ in entries] if k == "habits" else manifest["meta"][k]
+    pending = iter(entries)
+
+    def gen_habit(h):
+        records = read_shard_habit(shard_dir, next(pending), verify=verify)
+        habit = records[0]["habit"]
+        td = habit.get("trackingDurations", {})
+        dcs = habit.get("dailyCompletionStatus", {})
+        h.update(habit)
+        h["trackingDurations"] = {}
+        h["dailyCompletionStatus"] = {}
+        if manifest["shard_by"] == "habit":
+            yield None, td, dcs
+        for r in records[1:]:
+            yield r["month"], r["trackingDurations"], r["dailyCompletionStatus"]
+
+    stream_backup(out_path, data, gen_habit, indent=indent)
+    return out_path
 
 def month_days(y, m):
     n = calendar.monthrange(y, m)[1]
@@ -28,43 +327,118 @@ def fmt_iso(dt):
 def fmt_midnight_iso(d):
     return datetime(d.year, d.month, d.day).strftime("%Y-%m-%dT00:00:00.000")
 
-def jittered_durations(total_ms, count, cap_ms=69 * 60 * 1000):
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY_MS = 86400000
+
+def epoch_ms(dt):
+    return (((dt.toordinal() - EPOCH_ORDINAL) * 24 + dt.hour) * 60 + dt.minute) * 60000 + dt.second * 1000 \
+        + dt.microsecond // 1000
+
+class MonthColumns:
+    __slots__ = ("times", "durations", "first", "days")
+
+    def __init__(self, first, times=None, durations=None, days=0):
+        self.times = times if times is not None else array("q")
+        self.durations = durations if durations is not None else array("q")
+        self.first = first
+        self.days = days
+
+    def mark(self, d):
+        self.days |= 1 << (d.toordinal() - self.first)
+
+    @property
+    def sessions(self):
+        return len(self.times)
+
+    @property
+    def checkins(self):
+        return bin(self.days).count("1")
+
+    def duration_ms(self):
+        if np is not None and isinstance(self.durations, np.ndarray):
+            return int(self.durations.sum())
+        return sum(self.durations)
+
+    def td(self):
+        if np is not None and isinstance(self.times, np.ndarray):
+            keys = np.datetime_as_string(self.times.view("datetime64[ms]"), unit="ms").tolist()
+            return dict(zip(keys, [[v] for v in self.durations.tolist()]))
+        out = {}
+        prefix_day = None
+        prefix = ""
+        for t, v in zip(self.times, self.durations):
+            day, rem = divmod(t, DAY_MS)
+            if day != prefix_day:
+                prefix_day = day
+                prefix = date.fromordinal(day + EPOCH_ORDINAL).isoformat() + "T"
+            sec, ms = divmod(rem, 1000)
+            minute, sec = divmod(sec, 60)
+            out[f"{prefix}{minute // 60:02d}:{minute % 60:02d}:{sec:02d}.{ms:03d}"] = [v]
+        return out
+
+    def dcs(self):
+        out = {}
+        bits = self.days
+        i = 0
+        while bits:
+            if bits & 1:
+                out[date.fromordinal(self.first + i).isoformat() + "T00:00:00.000"] = True
+            bits >>= 1
+            i += 1
+        return out
+
+    def to_json(self):
+        return {"first": self.first, "days": self.days, "times": self.times.tolist(),
+                "durations": self.durations.tolist()}
+
+    @classmethod
+    def from_json(cls, v):
+        return cls(v["first"], array("q", v["times"]), array("q", v["durations"]), v["days"])
+
+def spread_units(room, units):
+    total_room = sum(room)
+    units = min(units, total_room)
+    if units <= 0:
+        return [0] * len(room)
+    share = [units * r // total_room for r in room]
+    rest = units - sum(share)
+    if rest:
+        open_idx = [i for i, r in enumerate(room) if r > share[i]]
+        for k in range(rest):
+            share[open_idx[k * len(open_idx) // rest]] += 1
+    return share
+
+def settle_durations(res, total_ms, cap_ms):
+    s = sum(res)
+    target = int(total_ms)
+    if s < target:
+        add = spread_units([cap_ms - v for v in res], target - s)
+        res = [v + a for v, a in zip(res, add)]
+    elif s > target:
+        sub = spread_units([v - 1 for v in res], s - target)
+        res = [v - d for v, d in zip(res, sub)]
+    return res
+
+def duration_shortfall(total_ms, count, cap_ms=SESSION_CAP_MS):
+    if count <= 0 or total_ms <= 0:
+        return 0
+    return int(total_ms) - min(max(int(total_ms), count), count * cap_ms)
+
+def jittered_durations(total_ms, count, cap_ms=SESSION_CAP_MS, rng=random):
     if count <= 0 or total_ms <= 0:
         return []
     base = total_ms / count
     base = min(base, cap_ms)
     res = []
     for _ in range(count):
-        j = random.uniform(0.9, 1.1)
+        j = rng.uniform(0.9, 1.1)
         v = int(max(1, base * j))
         v = min(v, cap_ms)
         res.append(v)
-    s = sum(res)
-    target = int(total_ms)
-    if s < target:
-        diff = target - s
-        i = 0
-        while diff > 0 and i < len(res) * 4:
-            k = i % len(res)
-            room = cap_ms - res[k]
-            if room > 0:
-                add = min(room, diff, int(base * 0.1) or 1)
-                res[k] += add
-                diff -= add
-            i += 1
-        # if diff remains, target is infeasible under cap; leave as is
-    elif s > target:
-        diff = s - target
-        i = len(res) - 1
-        while diff > 0 and i >= 0:
-            dec = min(res[i] - 1, diff)
-            res[i] -= dec
-            diff -= dec
-            i -= 1
-    return res
+    return settle_durations(res, total_ms, cap_ms)
 
 def allocate_sessions(count, days, weekday_cap=2, weekend_cap=3, weekday_weight=1, weekend_weight=2, shuffle=True,
-                      min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None):
+                      min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None, rng=random):
     if count <= 0:
         return {d: 0 for d in days}
     weights = [weekend_weight if is_weekend(d) else weekday_weight for d in days]
@@ -74,7 +448,7 @@ def allocate_sessions(count, days, weekday_cap=2, weekend_cap=3, weekday_weight=
     for d in days:
         if is_weekend(d):
             if weekend_cap_min is not None and weekend_cap_max is not None:
-                cap = random.randint(int(weekend_cap_min), int(weekend_cap_max))
+                cap = rng.randint(int(weekend_cap_min), int(weekend_cap_max))
             else:
                 cap = weekend_cap
             caps.append(cap)
@@ -86,7 +460,7 @@ def allocate_sessions(count, days, weekday_cap=2, weekend_cap=3, weekday_weight=
     frac.sort(reverse=True)
     idx_cycle = [i for _, i in frac]
     if shuffle:
-        random.shuffle(idx_cycle)
+        rng.shuffle(idx_cycle)
     k = 0
     while remain > 0 and k < len(idx_cycle) * 10:
         i = idx_cycle[k % len(idx_cycle)]
@@ -97,7 +471,7 @@ def allocate_sessions(count, days, weekday_cap=2, weekend_cap=3, weekday_weight=
     if remain > 0:
         order = list(range(len(days)))
         if shuffle:
-            random.shuffle(order)
+            rng.shuffle(order)
         i = 0
         while remain > 0 and i < len(order) * 10:
             j = order[i % len(order)]
@@ -155,40 +529,296 @@ def rebalance_alloc(alloc_map, days, weekday_cap, weekend_cap, max_weekend_ratio
             break
     return alloc_map
 
-def gen_day_times(d, n):
+class AllocationInfeasible(ValueError):
+    def __init__(self, message, alloc, shortfall):
+        super().__init__(message)
+        self.alloc = alloc
+        self.shortfall = shortfall
+
+def fill_even(alloc, idx, caps, units, order_key):
+    heap = [(alloc[i], order_key[i], i) for i in idx if alloc[i] < caps[i]]
+    heapq.heapify(heap)
+    while units > 0 and heap:
+        a, o, i = heapq.heappop(heap)
+        alloc[i] = a + 1
+        units -= 1
+        if alloc[i] < caps[i]:
+            heapq.heappush(heap, (alloc[i], o, i))
+    return units
+
+def weekend_reach(order, mins, caps):
+    reach = [1]
+    for i in reversed(order):
+        nxt = prev = reach[-1]
+        for v in range(mins[i], caps[i] + 1):
+            nxt |= prev << v
+        reach.append(nxt)
+    reach.reverse()
+    return reach
+
+def nearest_total(bits, w, lo, hi):
+    for step in range(max(w - lo, hi - w) + 1):
+        for x in (w - step, w + step):
+            if lo <= x <= hi and bits >> x & 1:
+                return x
+    return None
+
+def allocate_exact(count, days, weekday_cap=2, weekend_cap=3, weekday_weight=1, weekend_weight=2, shuffle=True,
+                   min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None, max_weekend_ratio=None,
+                   rng=random):
+    n = len(days)
+    alloc = [0] * n
+    if count <= 0:
+        return {d: 0 for d in days}
+    weekend_idx = [i for i, d in enumerate(days) if is_weekend(d)]
+    weekday_idx = [i for i, d in enumerate(days) if not is_weekend(d)]
+    caps = [0] * n
+    for i in weekend_idx:
+        if weekend_cap_min is not None and weekend_cap_max is not None:
+            caps[i] = rng.randint(int(weekend_cap_min), int(weekend_cap_max))
+        else:
+            caps[i] = weekend_cap
+    for i in weekday_idx:
+        caps[i] = weekday_cap
+    if shuffle:
+        order_key = [rng.random() for _ in range(n)]
+    else:
+        order_key = list(range(n))
+    weekday_room = sum(caps[i] for i in weekday_idx)
+    weekend_room = sum(caps[i] for i in weekend_idx)
+    limit = int(count * max_weekend_ratio) if max_weekend_ratio is not None else count
+    weekend_max = min(weekend_room, limit)
+    tw = weekend_weight * len(weekend_idx) + weekday_weight * len(weekday_idx)
+    ideal = count * weekend_weight * len(weekend_idx) / tw if tw else 0
+    w = min(max(int(ideal + 0.5), count - weekday_room), weekend_max)
+    w = max(w, 0)
+    m = int(min_weekend_per_day or 0)
+    mins = {i: min(m, caps[i]) for i in weekend_idx if caps[i] > 0}
+    order = sorted(mins, key=lambda i: order_key[i])
+    active = order
+    used = 0
+    if m > 0:
+        reach = weekend_reach(order, mins, caps)
+        top = min(weekend_max, count)
+        fit = nearest_total(reach[0], w, max(0, count - weekday_room), top)
+        w = fit if fit is not None else nearest_total(reach[0], w, 0, top)
+        active = []
+        r = w
+        for j, i in enumerate(order):
+            v = next((v for v in range(mins[i], min(caps[i], r) + 1) if reach[j + 1] >> (r - v) & 1), None)
+            if v is None:
+                continue
+            active.append(i)
+            alloc[i] = mins[i]
+            used += mins[i]
+            r -= v
+    left = fill_even(alloc, active, caps, w - used, order_key)
+    left = fill_even(alloc, weekday_idx, caps, count - w + left, order_key)
+    result = {days[i]: alloc[i] for i in range(n)}
+    if left > 0:
+        raise AllocationInfeasible(
+            f"cannot place {count} sessions: weekday room {weekday_room}, weekend room {weekend_max}",
+            result, left)
+    return result
+
+def gen_day_times(d, n, rng=random):
     ts = []
     if n <= 0:
         return ts
     if is_weekend(d):
-        allowed_hours = list(range(9, 24))
+        allowed_hours = WEEKEND_HOURS
         span = len(allowed_hours)
         for i in range(n):
             idx = int((i + 1) * span / (n + 1)) - 1
             idx = max(0, min(span - 1, idx))
             h = allowed_hours[idx]
-            m = random.randint(0, 59)
-            s = random.randint(0, 59)
-            ms = random.randint(0, 999)
+            m = rng.randint(0, 59)
+            s = rng.randint(0, 59)
+            ms = rng.randint(0, 999)
             ts.append(datetime(d.year, d.month, d.day, h, m, s, ms * 1000))
     else:
-        midday_hours = [12, 13]
-        evening_hours = [18, 19, 20, 21, 22, 23]
+        midday_hours = MIDDAY_HOURS
+        evening_hours = EVENING_HOURS
         use_midday = min(n, len(midday_hours))
         use_evening = n - use_midday
         for i in range(use_midday):
             h = midday_hours[i % len(midday_hours)]
-            m = random.randint(0, 59)
-            s = random.randint(0, 59)
-            ms = random.randint(0, 999)
+            m = rng.randint(0, 59)
+            s = rng.randint(0, 59)
+            ms = rng.randint(0, 999)
             ts.append(datetime(d.year, d.month, d.day, h, m, s, ms * 1000))
         for i in range(use_evening):
             h = evening_hours[i % len(evening_hours)]
-            m = random.randint(0, 59)
-            s = random.randint(0, 59)
-            ms = random.randint(0, 999)
+            m = rng.randint(0, 59)
+            s = rng.randint(0, 59)
+            ms = rng.randint(0, 999)
             ts.append(datetime(d.year, d.month, d.day, h, m, s, ms * 1000))
     return ts
 
+WEEKDAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+MINUTES_PER_DAY = 24 * 60
+_alias_tables = {}
+
+def profile_weights(v, size, what):
+    if v is None:
+        return [1.0] * size
+    if isinstance(v, dict):
+        w = [0.0] * size
+        for k, x in v.items():
+            i = int(k)
+            if not 0 <= i < size:
+                raise ValueError(f"{what} index {k} out of range 0..{size - 1}")
+            w[i] = float(x)
+    else:
+        w = [float(x) for x in v]
+        if len(w) != size:
+            raise ValueError(f"{what} needs {size} weights, got {len(w)}")
+    if any(x < 0 for x in w) or not sum(w) > 0:
+        raise ValueError(f"{what} weights must be non-negative with a positive sum")
+    return w
+
+def load_hour_profile(p):
+    raw = load_json(p)
+    spec = []
+    for wd, name in enumerate(WEEKDAY_NAMES):
+        entry = raw.get(name) or raw.get("weekend" if wd >= 5 else "weekday") or raw.get("default")
+        if entry is None:
+            raise ValueError(f"hour profile has no entry for {name} (or weekday/weekend/default)")
+        spec.append([profile_weights(entry.get("hours"), 24, f"{name}.hours"),
+                     profile_weights(entry.get("minutes"), 60, f"{name}.minutes")])
+    return spec
+
+def build_alias(weights):
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n / total for w in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, x in enumerate(scaled) if x < 1.0]
+    large = [i for i, x in enumerate(scaled) if x >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    return prob, alias
+
+def compile_hour_profile(spec):
+    key = json.dumps(spec)
+    tables = _alias_tables.get(key)
+    if tables is None:
+        tables = [build_alias([hw * mw for hw in hours for mw in minutes]) for hours, minutes in spec]
+        _alias_tables[key] = tables
+    return tables
+
+def sample_alias(table, rng):
+    prob, alias = table
+    u = rng.random() * len(prob)
+    i = int(u)
+    return i if u - i < prob[i] else alias[i]
+
+def profile_day_times(d, n, tables, rng=random):
+    table = tables[d.weekday()]
+    base = datetime(d.year, d.month, d.day)
+    ms = sorted(sample_alias(table, rng) * 60000 + int(rng.random() * 60000) for _ in range(n))
+    return [base + timedelta(milliseconds=x) for x in ms]
+
+def np_alias_tables(spec):
+    key = ("np", json.dumps(spec))
+    arrays = _alias_tables.get(key)
+    if arrays is None:
+        tables = compile_hour_profile(spec)
+        arrays = (np.array([t[0] for t in tables], dtype=np.float64),
+                  np.array([t[1] for t in tables], dtype=np.int64))
+        _alias_tables[key] = arrays
+    return arrays
+
+_np_rng = None
+
+def default_np_rng():
+    global _np_rng
+    if _np_rng is None:
+        _np_rng = np.random.default_rng()
+    return _np_rng
+
+def np_spread_units(room, units):
+    total_room = int(room.sum())
+    units = min(units, total_room)
+    if units <= 0:
+        return np.zeros_like(room)
+    share = units * room // total_room
+    rest = units - int(share.sum())
+    if rest:
+        open_idx = np.flatnonzero(room > share)
+        share[open_idx[np.arange(rest) * len(open_idx) // rest]] += 1
+    return share
+
+def np_settle_durations(res, total_ms, cap_ms):
+    target = int(total_ms)
+    s = int(res.sum())
+    if s < target:
+        res += np_spread_units(cap_ms - res, target - s)
+    elif s > target:
+        res -= np_spread_units(res - 1, s - target)
+    return res
+
+def np_jittered_durations(total_ms, count, cap_ms=SESSION_CAP_MS, rng=None):
+    if count <= 0 or total_ms <= 0:
+        return np.zeros(0, dtype=np.int64)
+    rng = rng or default_np_rng()
+    base = min(total_ms / count, cap_ms)
+    res = np.maximum(1.0, base * rng.uniform(0.9, 1.1, count)).astype(np.int64)
+    np.minimum(res, cap_ms, out=res)
+    return np_settle_durations(res, total_ms, cap_ms)
+
+def np_session_offsets(per_day, rng=None, hour_profile=None):
+    rng = rng or default_np_rng()
+    counts = np.array([n for _, n in per_day], dtype=np.int64)
+    days = np.array([d.isoformat() for d, _ in per_day], dtype="datetime64[D]")
+    total = int(counts.sum())
+    if hour_profile is not None:
+        prob, alias = np_alias_tables(hour_profile)
+        wd = np.repeat(np.array([d.weekday() for d, _ in per_day], dtype=np.int64), counts)
+        u = rng.random(total) * MINUTES_PER_DAY
+        cell = u.astype(np.int64)
+        cell = np.where(u - cell < prob[wd, cell], cell, alias[wd, cell])
+        offsets = cell * 60000 + rng.integers(0, 60000, total)
+        times = np.repeat(days, counts).astype("datetime64[ms]") + offsets.astype("timedelta64[ms]")
+        return np.sort(times)
+    starts = np.cumsum(counts) - counts
+    i = np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+    n = np.repeat(counts, counts)
+    weekend = np.repeat(np.array([is_weekend(d) for d, _ in per_day], dtype=bool), counts)
+    span = len(WEEKEND_HOURS)
+    weekend_hour = WEEKEND_HOURS[0] + np.clip((i + 1) * span // (n + 1) - 1, 0, span - 1)
+    use_midday = np.minimum(n, len(MIDDAY_HOURS))
+    weekday_hour = np.where(i < use_midday,
+                            np.array(MIDDAY_HOURS)[i % len(MIDDAY_HOURS)],
+                            np.array(EVENING_HOURS)[(i - use_midday) % len(EVENING_HOURS)])
+    hours = np.where(weekend, weekend_hour, weekday_hour)
+    minutes = rng.integers(0, 60, total)
+    seconds = rng.integers(0, 60, total)
+    millis = rng.integers(0, 1000, total)
+    offsets = ((hours * 60 + minutes) * 60 + seconds) * 1000 + millis
+    return np.repeat(days, counts).astype("datetime64[ms]") + offsets.astype("timedelta64[ms]")
+
+def np_generate_sessions(per_day, total_ms, cnt, rng=None, hour_profile=None):
+    if not per_day:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    rng = rng or default_np_rng()
+    durations = np_jittered_durations(total_ms, cnt, rng=rng)
+    ms = np_session_offsets(per_day, rng=rng, hour_profile=hour_profile)[:len(durations)].astype(np.int64)
+    if len(np.unique(ms)) != len(ms):
+        seen = set()
+        for i, v in enumerate(ms.tolist()):
+            while v in seen:
+                v -= 1
+            seen.add(v)
+            ms[i] = v
+    return ms, durations[:len(ms)].astype(np.int64)
+
 def parse_month_key(k):
     dt = datetime.strptime(k, "%Y-%m")
     return dt.year, dt.month
@@ -222,117 +852,676 @@ def summarize_generated(h):
     sums = {}
     if h.get("trackTime", False):
         for k, arr in h.get("trackingDurations", {}).items():
+            if not arr:
+                continue
             mk = month_key_from_ts(k)
-            v = int(arr[0]) if arr else 0
             if mk not in sums:
                 sums[mk] = {"count": 0, "duration_ms": 0}
-            sums[mk]["count"] += 1
-            sums[mk]["duration_ms"] += v
+            sums[mk]["count"] += len(arr)
+            sums[mk]["duration_ms"] += sum(int(v) for v in arr)
     else:
-        for k in h.get("dailyCompletionStatus", {}).keys():
+        for k, done in h.get("dailyCompletionStatus", {}).items():
+            if done is not True:
+                continue
             mk = month_key_from_ts(k)
             if mk not in sums:
                 sums[mk] = {"count": 0}
             sums[mk]["count"] += 1
     return sums
 
+JSON_TOKEN = re.compile(r'[ \t\r\n]*(?:([{}\[\]:,])|"((?:[^"\\]|\\.)*)"|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))')
+JSON_LITERALS = {"true": True, "false": False, "null": None}
+
+def iter_json_events(f, chunk_size=1 << 16):
+    buf = ""
+    pos = 0
+    eof = False
+    in_map = []
+    key_next = False
+    while True:
+        m = JSON_TOKEN.match(buf, pos)
+        if m is None or (m.end() == len(buf) and not eof and m.lastindex != 1):
+            if eof:
+                if buf[pos:].strip():
+                    raise ValueError(f"invalid JSON near: {buf[pos:pos + 40]!r}")
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        pos = m.end()
+        punct, string, number, literal = m.groups()
+        if punct is not None:
+            key_next = False
+            if punct == ",":
+                key_next = in_map[-1]
+            elif punct == "{":
+                in_map.append(True)
+                key_next = True
+                yield "start_map", None
+            elif punct == "[":
+                in_map.append(False)
+                yield "start_array", None
+            elif punct == "}":
+                in_map.pop()
+                yield "end_map", None
+            elif punct == "]":
+                in_map.pop()
+                yield "end_array", None
+            continue
+        if string is not None:
+            v = json.loads('"' + string + '"') if "\\" in string else string
+            if key_next:
+                key_next = False
+                yield "key", v
+            else:
+                yield "value", v
+        elif number is not None:
+            yield "value", float(number) if any(c in number for c in ".eE") else int(number)
+        else:
+            yield "value", JSON_LITERALS[literal]
+
+def stream_summaries(path):
+    habits = []
+    stack = []
+    key = None
+    h = None
+    in_td = in_dcs = False
+    mk = None
+    with open(path, "r", encoding="utf-8") as f:
+        for ev, v in iter_json_events(f):
+            if ev == "key":
+                key = v
+                continue
+            if ev == "start_map" or ev == "start_array":
+                depth = len(stack)
+                stack.append(key)
+                if depth == 2 and stack[1] == "habits" and ev == "start_map":
+                    h = {"id": None, "name": None, "trackTime": False, "td": {}, "dcs": {}}
+                elif depth == 3 and h is not None:
+                    in_td = key == "trackingDurations"
+                    in_dcs = key == "dailyCompletionStatus"
+                elif depth == 4 and in_td:
+                    mk = month_key_from_ts(key)
+                key = None
+                continue
+            if ev == "end_map" or ev == "end_array":
+                stack.pop()
+                depth = len(stack)
+                if depth == 3:
+                    in_td = in_dcs = False
+                elif depth == 2 and h is not None:
+                    habits.append(h)
+                    h = None
+                continue
+            depth = len(stack)
+            if depth == 3 and h is not None and key in ("id", "name", "trackTime"):
+                h[key] = v
+            elif depth == 5 and in_td:
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    cur = h["td"].setdefault(mk, {"count": 0, "duration_ms": 0})
+                    cur["count"] += 1
+                    cur["duration_ms"] += int(v)
+            elif depth == 4 and in_dcs and v is True:
+                cur = h["dcs"].setdefault(month_key_from_ts(key), {"count": 0})
+                cur["count"] += 1
+    return [{"id": h["id"], "name": h["name"], "trackTime": h["trackTime"],
+             "sums": h["td"] if h["trackTime"] else h["dcs"]} for h in habits]
+
+def summarize_month(track_time, mk, cols):
+    if track_time:
+        if not cols.sessions:
+            return {}
+        return {mk: {"count": cols.sessions, "duration_ms": cols.duration_ms()}}
+    if not cols.days:
+        return {}
+    return {mk: {"count": cols.checkins}}
+
+def merge_sums(into, sums):
+    for mk, v in sums.items():
+        cur = into.setdefault(mk, {k: 0 for k in v})
+        for k, n in v.items():
+            cur[k] = cur.get(k, 0) + n
+    return into
+
+def check_habit(name, g, months, tolerance_ms=0):
+    report = []
+    for mk, mv in months.items():
+        ac = int(mv.get("count", 0))
+        ad = mv.get("duration_ms")
+        gc = int(g.get(mk, {}).get("count", 0))
+        gd = g.get(mk, {}).get("duration_ms")
+        if gd is None:
+            gd = 0
+        okc = (gc == ac)
+        okd = True
+        if ad is not None:
+            cap_ms = 69 * 60 * 1000
+            effective_expected = min(int(ad), ac * cap_ms)
+            okd = abs(int(gd) - int(effective_expected)) <= int(tolerance_ms)
+        elif ad is not None:
+            okd = False
+        status = okc and okd
+        if not status:
+            report.append({
+                "habit": name,
+                "month": mk,
+                "expected_count": ac,
+                "actual_count": gc,
+                "expected_duration_ms": ad,
+                "actual_duration_ms": gd
+            })
+    return report
+
 def verify_data(data, agg_map, tolerance_ms=0):
     report = []
     for h in data.get("habits", []):
         hid = h.get("id")
         g = summarize_generated(h)
-        months = agg_map.get(hid, {})
-        for mk, mv in months.items():
-            ac = int(mv.get("count", 0))
-            ad = mv.get("duration_ms")
-            gc = int(g.get(mk, {}).get("count", 0))
-            gd = g.get(mk, {}).get("duration_ms")
-            if gd is None:
-                gd = 0
-            okc = (gc == ac)
-            okd = True
-            if ad is not None:
-                cap_ms = 69 * 60 * 1000
-                effective_expected = min(int(ad), ac * cap_ms)
-                okd = abs(int(gd) - int(effective_expected)) <= int(tolerance_ms)
-            elif ad is not None:
-                okd = False
-            status = okc and okd
-            if not status:
-                report.append({
-                    "habit": h.get("name"),
-                    "month": mk,
-                    "expected_count": ac,
-                    "actual_count": gc,
-                    "expected_duration_ms": ad,
-                    "actual_duration_ms": gd
-                })
+        report.extend(check_habit(h.get("name"), g, agg_map.get(hid, {}), tolerance_ms=tolerance_ms))
     return report
 
-def process(source_path, aggregate_path, outdir=None, tolerance_ms=0, strict=False,
-            weekday_cap=2, weekend_cap=3, weekday_weight=1, weekend_weight=2,
-            max_weekend_ratio=0.6, shuffle_allocation=True,
-            min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None):
-    data = load_json(source_path)
-    habits = data.get("habits", [])
-    aggregates = load_json(aggregate_path)
-    agg_map = build_aggregate_map(aggregates, habits)
-    for h in habits:
-        h["trackingDurations"] = {}
-        h["dailyCompletionStatus"] = {}
+NULL_STAGE = contextlib.nullcontext()
+
+class Profiler:
+    def __init__(self, trace_memory=False):
+        self.stages = {}
+        self.habits = []
+        self.trace_memory = trace_memory
+        self.started = time.perf_counter()
+        if trace_memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+            tracemalloc.start()
+
+    def add(self, name, seconds, items=0, peak=None):
+        st = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "items": 0, "peak_bytes": 0})
+        st["seconds"] += seconds
+        st["calls"] += 1
+        st["items"] += items
+        if peak is not None:
+            st["peak_bytes"] = max(st["peak_bytes"], peak)
+
+    @contextlib.contextmanager
+    def stage(self, name, items=0):
+        if self.trace_memory:
+            self.tracemalloc.reset_peak()
+        t = time.perf_counter()
+        box = {"items": items}
+        try:
+            yield box
+        finally:
+            peak = self.tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            self.add(name, time.perf_counter() - t, box["items"], peak)
+
+    def timed(self, it, box):
+        it = iter(it)
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                box["seconds"] += time.perf_counter() - t
+                return
+            box["seconds"] += time.perf_counter() - t
+            yield item
+
+    def habit(self, h, seconds, months, sessions, checkins):
+        self.habits.append({"id": h.get("id"), "name": h.get("name"), "seconds": seconds, "months": months,
+                            "sessions": sessions, "checkins": checkins})
+
+    def metrics(self):
+        total = time.perf_counter() - self.started
+        peak_rss = None
+        try:
+            import resource
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+        return {"total_seconds": total, "peak_rss_bytes": peak_rss, "trace_memory": self.trace_memory,
+                "stages": self.stages, "habits": self.habits}
+
+    def report(self, top=10):
+        m = self.metrics()
+        print(f"PROFILE total={m['total_seconds']:.3f}s peak_rss_mb={(m['peak_rss_bytes'] or 0) / 1048576:.1f}")
+        peak = f"{'peak_mb':>9}" if self.trace_memory else ""
+        print(f"{'stage':<14}{'seconds':>10}{'calls':>9}{'items':>11}{'items/s':>12}{peak}")
+        for name, st in self.stages.items():
+            rate = int(st["items"] / st["seconds"]) if st["seconds"] > 0 else 0
+            peak = f"{st['peak_bytes'] / 1048576:>9.1f}" if self.trace_memory else ""
+            print(f"{name:<14}{st['seconds']:>10.3f}{st['calls']:>9}{st['items']:>11}{rate:>12}{peak}")
+        slow = sorted(self.habits, key=lambda x: x["seconds"], reverse=True)[:top]
+        if slow:
+            print(f"{'habit':<32}{'seconds':>10}{'months':>8}{'sessions':>10}{'checkins':>10}")
+            for x in slow:
+                print(f"{str(x['name'])[:31]:<32}{x['seconds']:>10.3f}{x['months']:>8}{x['sessions']:>10}"
+                      f"{x['checkins']:>10}")
+
+def stage(prof, name, items=0):
+    return prof.stage(name, items) if prof is not None else NULL_STAGE
+
+def month_seed(seed, hid, mk):
+    digest = hashlib.sha256(f"{seed}:{hid}:{mk}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+def generate_month(hid, track_time, mk, mv, params, report=None, prof=None):
+    rng = random
+    np_rng = None
+    if params["seed"] is not None:
+        n = month_seed(params["seed"], hid, mk)
+        rng = random.Random(n)
+        if params["engine"] == "numpy":
+            np_rng = np.random.default_rng(n)
+    y, m = parse_month_key(mk)
+    cnt = int(mv.get("count", 0))
+    total_ms = int(mv.get("duration_ms", 0))
+    days = month_days(y, m)
+    if prof is not None:
+        t0 = time.perf_counter()
+    if params["allocator"] == "exact":
+        try:
+            if track_time:
+                alloc = allocate_exact(cnt, days, weekday_cap=params["weekday_cap"], weekend_cap=params["weekend_cap"],
+                                       weekday_weight=params["weekday_weight"],
+                                       weekend_weight=params["weekend_weight"],
+                                       shuffle=params["shuffle_allocation"],
+                                       min_weekend_per_day=params["min_weekend_per_day"],
+                                       weekend_cap_min=params["weekend_cap_min"],
+                                       weekend_cap_max=params["weekend_cap_max"],
+                                       max_weekend_ratio=params["max_weekend_ratio"],
+                                       rng=rng)
+            else:
+                alloc = allocate_exact(cnt, days, weekday_cap=1, weekend_cap=1,
+                                       weekday_weight=params["weekday_weight"],
+                                       weekend_weight=params["weekend_weight"],
+                                       shuffle=params["shuffle_allocation"],
+                                       rng=rng)
+        except AllocationInfeasible as e:
+            alloc = e.alloc
+            if report is not None:
+                report.append({"kind": "allocation", "month": mk, "count": cnt, "shortfall": e.shortfall,
+                               "reason": str(e)})
+    elif track_time:
+        alloc = allocate_sessions(cnt, days, weekday_cap=params["weekday_cap"], weekend_cap=params["weekend_cap"],
+                                  weekday_weight=params["weekday_weight"], weekend_weight=params["weekend_weight"],
+                                  shuffle=params["shuffle_allocation"],
+                                  min_weekend_per_day=params["min_weekend_per_day"],
+                                  weekend_cap_min=params["weekend_cap_min"],
+                                  weekend_cap_max=params["weekend_cap_max"],
+                                  rng=rng)
+        alloc = rebalance_alloc(alloc, days, params["weekday_cap"], params["weekend_cap"],
+                                max_weekend_ratio=params["max_weekend_ratio"])
+    else:
+        alloc = allocate_sessions(cnt, days, weekday_cap=1, weekend_cap=1,
+                                  weekday_weight=params["weekday_weight"], weekend_weight=params["weekend_weight"],
+                                  shuffle=params["shuffle_allocation"],
+                                  min_weekend_per_day=0,
+                                  weekend_cap_min=None,
+                                  weekend_cap_max=None,
+                                  rng=rng)
+    per_day = []
+    for d, n in alloc.items():
+        if n > 0:
+            per_day.append((d, n))
+    per_day.sort(key=lambda x: x[0])
+    if prof is not None:
+        t1 = time.perf_counter()
+        prof.add("allocation", t1 - t0, cnt)
+    cols = MonthColumns(days[0].toordinal())
+    if track_time and report is not None:
+        short = duration_shortfall(total_ms, cnt)
+        if short:
+            report.append({"kind": "duration", "month": mk, "count": cnt, "shortfall": short,
+                           "reason": "duration_ms exceeds count x cap" if short > 0 else "duration_ms below 1 ms per session"})
+    if track_time and params["engine"] == "numpy":
+        cols.times, cols.durations = np_generate_sessions(per_day, total_ms, cnt, rng=np_rng,
+                                                          hour_profile=params["hour_profile"])
+        for d, n in per_day:
+            cols.mark(d)
+    elif track_time:
+        durations = jittered_durations(total_ms, cnt, rng=rng)
+        tables = compile_hour_profile(params["hour_profile"]) if params["hour_profile"] is not None else None
+        seen = set()
+        di = 0
+        for d, n in per_day:
+            times = gen_day_times(d, n, rng=rng) if tables is None else profile_day_times(d, n, tables, rng=rng)
+            if n > 0:
+                cols.mark(d)
+            for t in times:
+                if di < len(durations):
+                    k = epoch_ms(t)
+                    while k in seen:
+                        k -= 1
+                    seen.add(k)
+                    cols.times.append(k)
+                    cols.durations.append(int(durations[di]))
+                    di += 1
+    else:
+        for d, n in per_day:
+            if n > 0:
+                cols.mark(d)
+    if prof is not None:
+        prof.add("timestamps", time.perf_counter() - t1, cols.sessions + cols.checkins)
+    return cols
+
+def json_months(month_results):
+    for mk, cols in month_results:
+        yield mk, cols.td(), cols.dcs()
+
+def tag_issues(name, issues):
+    return [dict(habit=name, **i) for i in issues]
+
+class MonthCache:
+    VERSION = 3
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, hid, track_time, mk, mv, params):
+        raw = json.dumps([self.VERSION, hid, bool(track_time), mk, mv, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        p = self.path(key)
+        try:
+            entry = load_json(p)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(p)
+        self.hits += 1
+        return MonthColumns.from_json(entry["cols"]), entry["issues"]
+
+    def put(self, key, cols, issues):
+        p = self.path(key)
+        p.parent.mkdir(exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        save_json(tmp, {"cols": cols.to_json(), "issues": issues}, indent=None)
+        os.replace(tmp, p)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for p in self.root.glob("*/*.json"):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink()
+            total -= size
+            self.evicted += 1
+        return total
+
+    def summary(self):
+        size = self.evict()
+        return f"CACHE hits={self.hits} misses={self.misses} evicted={self.evicted} size_bytes={size}"
+
+def generate_habit(h, months, params, report=None, cache=None, prof=None):
+    track_time = h.get("trackTime", False)
+    for mk, mv in months.items():
+        hit = None
+        if cache is not None:
+            key = cache.key(h["id"], track_time, mk, mv, params)
+            hit = cache.get(key)
+        if hit is None:
+            issues = []
+            cols = generate_month(h["id"], track_time, mk, mv, params, issues, prof)
+            if cache is not None:
+                cache.put(key, cols, issues)
+        else:
+            cols, issues = hit
+        if report is not None:
+            report.extend(tag_issues(h.get("name"), issues))
+        yield cols
+
+def habit_job(job):
+    hid, track_time, months, params = job
+    t = time.perf_counter()
+    out = []
+    for mk, mv in months.items():
+        issues = []
+        out.append((generate_month(hid, track_time, mk, mv, params, issues), issues))
+    return out, time.perf_counter() - t
+
+class WorkerMonths:
+    __slots__ = ("months", "seconds")
+
+    def __init__(self, months, seconds):
+        self.months = iter(months)
+        self.seconds = seconds
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.months)
+
+def init_worker():
+    global _np_rng
+    _np_rng = None
+
+def iter_habit_results(habits, agg_map, params, report, workers=1, cache=None, prof=None):
+    if workers <= 1:
+        for h in habits:
+            yield h, generate_habit(h, agg_map.get(h["id"], {}), params, report, cache, prof)
+        return
+
+    def submit(ex, h):
         months = agg_map.get(h["id"], {})
-        td = {}
-        dcs = {}
-        for mk, mv in months.items():
-            y, m = parse_month_key(mk)
-            cnt = int(mv.get("count", 0))
-            total_ms = int(mv.get("duration_ms", 0))
-            days = month_days(y, m)
-            if h.get("trackTime", False):
-                alloc = allocate_sessions(cnt, days, weekday_cap=weekday_cap, weekend_cap=weekend_cap,
-                                          weekday_weight=weekday_weight, weekend_weight=weekend_weight,
-                                          shuffle=shuffle_allocation,
-                                          min_weekend_per_day=min_weekend_per_day,
-                                          weekend_cap_min=weekend_cap_min,
-                                          weekend_cap_max=weekend_cap_max)
-                alloc = rebalance_alloc(alloc, days, weekday_cap, weekend_cap, max_weekend_ratio=max_weekend_ratio)
+        track_time = h.get("trackTime", False)
+        hits = {}
+        if cache is not None:
+            for mk, mv in months.items():
+                key = cache.key(h["id"], track_time, mk, mv, params)
+                hits[mk] = (key, cache.get(key))
+        dirty = {mk: mv for mk, mv in months.items() if hits.get(mk, (None, None))[1] is None}
+        return h, hits, ex.submit(habit_job, (h["id"], track_time, dirty, params))
+
+    def collect(h, hits, fut):
+        fresh, seconds = fut.result()
+        fresh = iter(fresh)
+        out = []
+        for mk in agg_map.get(h["id"], {}):
+            key, hit = hits.get(mk, (None, None))
+            if hit is None:
+                hit = next(fresh)
+                if cache is not None:
+                    cache.put(key, *hit)
+            report.extend(tag_issues(h.get("name"), hit[1]))
+            out.append(hit[0])
+        return h, WorkerMonths(out, seconds)
+
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as ex:
+        pending = deque()
+        for h in habits:
+            pending.append(submit(ex, h))
+            if len(pending) >= window:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+
+SCALE_ICONS = ["book", "menu_book", "school", "fitness_center", "water_drop", "directions_run", "coffee", "edit"]
+SCALE_COLORS = [0xFF2196F3, 0xFF4CAF50, 0xFFFF9800, 0xFF9C27B0, 0xFFE91E63, 0xFF009688]
+
+def month_capacity(days, weekday_cap, weekend_cap):
+    return sum(weekend_cap if is_weekend(d) else weekday_cap for d in days)
+
+def scale_fixture(habits=100, years=1, start_year=None, track_ratio=0.7, sessions_per_month=30,
+                  session_minutes=40, checkins_per_month=20, spread=0.5, weekday_cap=2, weekend_cap=3, seed=None):
+    rng = random.Random(f"scale:{seed}") if seed is not None else random.Random()
+    start_year = start_year or date.today().year - years
+    month_keys = [f"{y}-{m:02d}" for y in range(start_year, start_year + years) for m in range(1, 13)]
+    data = {"habits": [], "settings": {}}
+    agg_map = {}
+    for i in range(habits):
+        hid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        track_time = rng.random() < track_ratio
+        months = {}
+        total_ms = 0
+        for mk in month_keys:
+            days = month_days(*parse_month_key(mk))
+            if track_time:
+                mean = sessions_per_month
+                room = month_capacity(days, weekday_cap, weekend_cap)
             else:
-                alloc = allocate_sessions(cnt, days, weekday_cap=1, weekend_cap=1,
-                                          weekday_weight=weekday_weight, weekend_weight=weekend_weight,
-                                          shuffle=shuffle_allocation,
-                                          min_weekend_per_day=0,
-                                          weekend_cap_min=None,
-                                          weekend_cap_max=None)
-            per_day = []
-            for d, n in alloc.items():
-                if n > 0:
-                    per_day.append((d, n))
-            per_day.sort(key=lambda x: x[0])
-            if h.get("trackTime", False):
-                durations = jittered_durations(total_ms, cnt)
-                di = 0
-                for d, n in per_day:
-                    times = gen_day_times(d, n)
-                    if n > 0:
-                        dcs[fmt_midnight_iso(d)] = True
-                    for t in times:
-                        if di < len(durations):
-                            k = fmt_iso(t)
-                            td[k] = [int(durations[di])]
-                            di += 1
+                mean = checkins_per_month
+                room = len(days)
+            cnt = min(room, max(0, int(rng.uniform(mean * (1 - spread), mean * (1 + spread)))))
+            if track_time:
+                minutes = max(1.0, min(rng.gauss(session_minutes, session_minutes * spread / 2), 69))
+                dur = int(cnt * minutes * 60 * 1000)
+                months[mk] = {"count": cnt, "duration_ms": dur}
+                total_ms += dur
             else:
-                for d, n in per_day:
-                    if n > 0:
-                        dcs[fmt_midnight_iso(d)] = True
-        h["trackingDurations"] = td
-        h["dailyCompletionStatus"] = dcs
+                months[mk] = {"count": cnt}
+        agg_map[hid] = months
+        data["habits"].append({
+            "id": hid,
+            "name": f"Scale Habit {i + 1}",
+            "totalDuration": total_ms,
+            "currentDays": 0,
+            "targetDays": 1,
+            "goalType": 0,
+            "imagePath": None,
+            "cycleType": rng.randint(0, 3),
+            "icon": SCALE_ICONS[i % len(SCALE_ICONS)],
+            "trackTime": track_time,
+            "colorValue": SCALE_COLORS[i % len(SCALE_COLORS)],
+            "descriptionJson": None,
+            "shortDescription": None,
+            "trackingDurations": {},
+            "dailyCompletionStatus": {},
+            "targetTimeMinutes": session_minutes if track_time else None,
+        })
+    return data, agg_map
+
+def make_params(weekday_cap=2, weekend_cap=3, weekday_weight=1, weekend_weight=2, max_weekend_ratio=0.6,
+                shuffle_allocation=True, min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None,
+                engine="python", allocator="exact", seed=None, hour_profile=None):
+    return {
+        "weekday_cap": weekday_cap,
+        "weekend_cap": weekend_cap,
+        "weekday_weight": weekday_weight,
+        "weekend_weight": weekend_weight,
+        "max_weekend_ratio": max_weekend_ratio,
+        "shuffle_allocation": shuffle_allocation,
+        "min_weekend_per_day": min_weekend_per_day,
+        "weekend_cap_min": weekend_cap_min,
+        "weekend_cap_max": weekend_cap_max,
+        "engine": engine,
+        "allocator": allocator,
+        "seed": seed,
+        "hour_profile": hour_profile,
+    }
+
+def process(source_path, aggregate_path, outdir=None, tolerance_ms=0, strict=False,
+            weekday_cap=2, weekend_cap=3, weekday_weight=1, weekend_weight=2,
+            max_weekend_ratio=0.6, shuffle_allocation=True,
+            min_weekend_per_day=0, weekend_cap_min=None, weekend_cap_max=None,
+            stream=False, indent=4, engine="python", allocator="exact", seed=None, workers=1,
+            cache_dir=None, cache_max_mb=512, scale=None, output_format="json", shards=4, shard_by="habit",
+            profile=False, profile_out=None, ensure_ascii=False, hour_profile=None, profile_memory=False):
+    if engine == "numpy" and np is None:
+        raise SystemExit("engine 'numpy' requires numpy to be installed")
+    prof = Profiler(trace_memory=profile_memory) if profile or profile_memory else None
+    if scale is not None:
+        with stage(prof, "scale_fixture"):
+            data, agg_map = scale_fixture(weekday_cap=weekday_cap, weekend_cap=weekend_cap, seed=seed, **scale)
+        habits = data["habits"]
+    else:
+        with stage(prof, "load_json"):
+            data = load_json(source_path)
+            habits = data.get("habits", [])
+            aggregates = load_json(aggregate_path)
+            agg_map = build_aggregate_map(aggregates, habits)
+    params = make_params(weekday_cap, weekend_cap, weekday_weight, weekend_weight, max_weekend_ratio,
+                         shuffle_allocation, min_weekend_per_day, weekend_cap_min, weekend_cap_max,
+                         engine, allocator, seed, hour_profile)
+    infeasible = []
     ts = str(int(time.time() * 1000))
-    src = Path(source_path)
-    target_dir = Path(outdir) if outdir else src.parent
+    target_dir = Path(outdir) if outdir else (Path(source_path).parent if source_path else Path.cwd())
     target_dir.mkdir(parents=True, exist_ok=True)
     out_path = target_dir / f"contrail_backup_{ts}.json"
-    save_json(out_path, data)
-    mismatches = verify_data(data, agg_map, tolerance_ms=tolerance_ms)
+    cache = MonthCache(cache_dir, cache_max_mb * 1024 * 1024) if cache_dir else None
+    results = iter_habit_results(habits, agg_map, params, infeasible, workers=workers, cache=cache, prof=prof)
+    mismatches = []
+    totals = {"sessions": 0, "checkins": 0, "generate_seconds": 0.0, "parent_seconds": 0.0}
+    started = time.perf_counter()
+    source = results
+    if prof is not None:
+        waited = {"seconds": 0.0}
+        results = prof.timed(results, waited)
+
+    def folded(h, month_results):
+        months = agg_map.get(h["id"], {})
+        track_time = h.get("trackTime", False)
+        g = {}
+        if prof is not None:
+            box = {"seconds": 0.0}
+            worker = getattr(month_results, "seconds", None)
+            month_results = prof.timed(month_results, box)
+            before = (totals["sessions"], totals["checkins"])
+        for mk, cols in zip(months, month_results):
+            merge_sums(g, summarize_month(track_time, mk, cols))
+            totals["sessions"] += cols.sessions
+            totals["checkins"] += cols.checkins
+            yield mk, cols
+        with stage(prof, "verify", len(months)):
+            mismatches.extend(check_habit(h.get("name"), g, months, tolerance_ms=tolerance_ms))
+        if prof is not None:
+            seconds = box["seconds"] if worker is None else worker
+            totals["generate_seconds"] += seconds
+            totals["parent_seconds"] += box["seconds"]
+            prof.habit(h, seconds, len(months), totals["sessions"] - before[0], totals["checkins"] - before[1])
+
+    if output_format == "ndjson" or stream:
+        with stage(prof, "write") as box:
+            if output_format == "ndjson":
+                out_path = write_shards(target_dir / f"contrail_backup_{ts}.shards", data,
+                                        lambda h: json_months(folded(*next(results))), shards=shards,
+                                        shard_by=shard_by)
+            else:
+                stream_backup(out_path, data, lambda h: json_months(folded(*next(results))), indent=indent,
+                              ensure_ascii=ensure_ascii)
+            results.close()
+            source.close()
+            if box is not None:
+                box["items"] = totals["sessions"] + totals["checkins"]
+        if prof is not None:
+            prof.stages["write"]["seconds"] -= totals["parent_seconds"] + waited["seconds"]
+    else:
+        generated = [list(folded(h, month_results)) for h, month_results in results]
+        pending = iter(generated)
+        with stage(prof, "write", totals["sessions"] + totals["checkins"]):
+            stream_backup(out_path, data, lambda h: json_months(next(pending)), indent=indent,
+                          ensure_ascii=ensure_ascii)
+    if infeasible:
+        print("INFEASIBLE " + json.dumps(infeasible, ensure_ascii=False))
+    if scale is not None:
+        elapsed = time.perf_counter() - started
+        records = totals["sessions"] + totals["checkins"]
+        print(f"SCALE habits={len(habits)} sessions={totals['sessions']} checkins={totals['checkins']} "
+              f"seconds={elapsed:.2f} records_per_sec={int(records / elapsed) if elapsed > 0 else records}")
+    if cache is not None:
+        print(cache.summary())
+    if prof is not None:
+        prof.add("generate", totals["generate_seconds"], totals["sessions"] + totals["checkins"])
+        prof.report()
+        if profile_out:
+            save_json(profile_out, prof.metrics())
     if mismatches:
         print("VERIFY_FAIL " + json.dumps(mismatches, ensure_ascii=False))
         if strict:
@@ -341,10 +1530,481 @@ def process(source_path, aggregate_path, outdir=None, tolerance_ms=0, strict=Fal
         print("VERIFY_OK")
     print(str(out_path))
 
+def file_stamp(p):
+    st = os.stat(p)
+    return st.st_mtime_ns, st.st_size
+
+def write_atomic(out_path, write):
+    out_path = Path(out_path)
+    fd, tmp = tempfile.mkstemp(prefix=out_path.name + ".", suffix=".tmp", dir=out_path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+class WatchState:
+    def __init__(self, source_path, aggregate_path, out_path, params, indent=4, ensure_ascii=False,
+                 tolerance_ms=0):
+        self.source_path = source_path
+        self.aggregate_path = aggregate_path
+        self.out_path = Path(out_path)
+        self.params = params
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.tolerance_ms = tolerance_ms
+        self.stamps = {}
+        self.data = None
+        self.months = {}
+        self.habits = {}
+
+    def poll(self):
+        return {p: file_stamp(p) for p in (self.source_path, self.aggregate_path)}
+
+    def refresh(self, stamps):
+        if self.data is None or stamps[self.source_path] != self.stamps.get(self.source_path):
+            self.data = load_json(self.source_path)
+            self.habits = {}
+        habits = self.data.get("habits", [])
+        agg_map = build_aggregate_map(load_json(self.aggregate_path), habits)
+        self.stamps = stamps
+        months_cache = {}
+        habit_cache = {}
+        stats = {"habits": 0, "months": 0}
+        for h in habits:
+            months = agg_map.get(h["id"], {})
+            prev = self.habits.get(h["id"])
+            if prev is not None and prev[0] == months:
+                entry = prev
+                for mk in months:
+                    key = (h["id"], mk)
+                    months_cache[key] = self.months[key]
+            else:
+                entry = self.build_habit(h, months, months_cache, stats)
+            habit_cache[h["id"]] = entry
+        self.months = months_cache
+        self.habits = habit_cache
+        write_atomic(self.out_path, self.write)
+        report = {"infeasible": [], "mismatches": []}
+        for h in habits:
+            _, _, issues, mismatches = habit_cache[h["id"]]
+            report["infeasible"].extend(issues)
+            report["mismatches"].extend(mismatches)
+        return stats, report
+
+    def build_habit(self, h, months, months_cache, stats):
+        track_time = h.get("trackTime", False)
+        month_results = []
+        issues = []
+        g = {}
+        stats["habits"] += 1
+        for mk, mv in months.items():
+            key = (h["id"], mk)
+            hit = self.months.get(key)
+            if hit is None or hit[0] != (track_time, mv):
+                month_issues = []
+                cols = generate_month(h["id"], track_time, mk, mv, self.params, month_issues)
+                hit = ((track_time, mv), cols, tag_issues(h.get("name"), month_issues))
+                stats["months"] += 1
+            months_cache[key] = hit
+            _, cols, month_issues = hit
+            month_results.append((mk, cols))
+            issues.extend(month_issues)
+            merge_sums(g, summarize_month(track_time, mk, cols))
+        buf = io.StringIO()
+        write_habit(buf, h, json_months(month_results), self.indent, 2, self.ensure_ascii)
+        return months, buf.getvalue(), issues, check_habit(h.get("name"), g, months, tolerance_ms=self.tolerance_ms)
+
+    def write(self, f):
+        indent = self.indent
+        kv = ": " if indent is not None else ":"
+        f.write("{")
+        for ti, (tk, tv) in enumerate(self.data.items()):
+            f.write(item_prefix(ti == 0, indent, 1) + json.dumps(tk, ensure_ascii=self.ensure_ascii) + kv)
+            if tk != "habits" or not isinstance(tv, list):
+                f.write(dump_value(tv, indent, 1, self.ensure_ascii))
+                continue
+            f.write("[")
+            for hi, h in enumerate(tv):
+                f.write(item_prefix(hi == 0, indent, 2) + self.habits[h["id"]][1])
+            f.write(close_prefix(len(tv) == 0, indent, 1) + "]")
+        f.write(close_prefix(len(self.data) == 0, indent, 0) + "}")
+
+def watch(source_path, aggregate_path, out_path, params, indent=4, ensure_ascii=False, tolerance_ms=0,
+          interval=0.5, max_cycles=None):
+    state = WatchState(source_path, aggregate_path, out_path, params, indent=indent, ensure_ascii=ensure_ascii,
+                       tolerance_ms=tolerance_ms)
+    cycles = 0
+    while max_cycles is None or cycles < max_cycles:
+        try:
+            stamps = state.poll()
+        except OSError:
+            stamps = None
+        if stamps is not None and stamps != state.stamps:
+            cycles += 1
+            started = time.perf_counter()
+            try:
+                stats, report = state.refresh(stamps)
+            except (OSError, ValueError) as e:
+                state.stamps = stamps
+                print(f"WATCH_ERROR {e}", flush=True)
+                continue
+            print(f"WATCH habits={stats['habits']}/{len(state.habits)} months={stats['months']} "
+                  f"seconds={time.perf_counter() - started:.3f}")
+            if report["infeasible"]:
+                print("INFEASIBLE " + json.dumps(report["infeasible"], ensure_ascii=False))
+            if report["mismatches"]:
+                print("VERIFY_FAIL " + json.dumps(report["mismatches"], ensure_ascii=False))
+            else:
+                print("VERIFY_OK")
+            print(str(state.out_path), flush=True)
+            continue
+        time.sleep(interval)
+
+def verify_backup(backup_path, aggregate_path, tolerance_ms=0):
+    summaries = stream_summaries(backup_path)
+    agg_map = build_aggregate_map(load_json(aggregate_path), [s for s in summaries if s["id"]])
+    report = []
+    for h in summaries:
+        report.extend(check_habit(h["name"], h["sums"], agg_map.get(h["id"], {}), tolerance_ms=tolerance_ms))
+    return report
+
+def verify_main(argv):
+    p = argparse.ArgumentParser(prog="generate_tracking_data.py verify")
+    p.add_argument("--backup", required=True)
+    p.add_argument("--aggregates", required=True)
+    p.add_argument("--tolerance_ms", type=int, default=0)
+    p.add_argument("--strict", action="store_true")
+    args = p.parse_args(argv)
+    mismatches = verify_backup(args.backup, args.aggregates, tolerance_ms=args.tolerance_ms)
+    if mismatches:
+        print("VERIFY_FAIL " + json.dumps(mismatches, ensure_ascii=False))
+        if args.strict:
+            raise SystemExit(1)
+    else:
+        print("VERIFY_OK")
+
+def backup_summaries(backup_path, stream_threshold_bytes=64 << 20):
+    if os.path.getsize(backup_path) > stream_threshold_bytes:
+        return stream_summaries(backup_path)
+    data = load_json(backup_path)
+    return [{"id": h.get("id"), "name": h.get("name"), "trackTime": h.get("trackTime", False),
+             "sums": summarize_generated(h)} for h in data.get("habits", [])]
+
+def extract_aggregates(backup_path, stream_threshold_bytes=64 << 20):
+    summaries = backup_summaries(backup_path, stream_threshold_bytes)
+    return {"habits": [{"id": h["id"], "name": h["name"], "months": dict(sorted(h["sums"].items()))}
+                       for h in summaries if h["id"]]}
+
+def extract_job(job):
+    backup_path, out_path, stream_threshold_bytes = job
+    agg = extract_aggregates(backup_path, stream_threshold_bytes)
+    save_json(out_path, agg)
+    months = sum(len(h["months"]) for h in agg["habits"])
+    records = sum(m["count"] for h in agg["habits"] for m in h["months"].values())
+    return str(out_path), len(agg["habits"]), months, records
+
+def find_backups(paths):
+    found = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            found.extend(sorted(p.glob("contrail_backup_*.json")))
+        else:
+            found.append(p)
+    return found
+
+def extract_main(argv):
+    p = argparse.ArgumentParser(prog="generate_tracking_data.py extract")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--out", default=None)
+    p.add_argument("--outdir", default=None)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--stream_threshold_mb", type=int, default=64)
+    args = p.parse_args(argv)
+    backups = find_backups(args.inputs)
+    if args.out and len(backups) != 1:
+        p.error("--out needs exactly one input backup; use --outdir for several")
+    threshold = args.stream_threshold_mb << 20
+    jobs = []
+    for b in backups:
+        if args.out:
+            out = Path(args.out)
+        else:
+            out_dir = Path(args.outdir) if args.outdir else b.parent
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out = out_dir / b.name.replace("contrail_backup_", "contrail_aggregates_", 1)
+        jobs.append((str(b), out, threshold))
+    started = time.perf_counter()
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(extract_job, jobs))
+    else:
+        results = [extract_job(j) for j in jobs]
+    for out, habits, months, records in results:
+        print(f"{out} habits={habits} months={months} records={records}")
+    print(f"EXTRACT files={len(results)} records={sum(r[3] for r in results)} "
+          f"seconds={time.perf_counter() - started:.2f}")
+
+MERGE_POLICIES = ("first", "last", "max")
+
+def merge_backups(paths, policy="last"):
+    index = {}
+    meta = {}
+    stats = {"files": 0, "habits": 0, "sessions": 0, "conflicts": 0}
+    for path in paths:
+        data = load_json(path)
+        stats["files"] += 1
+        for k, v in data.items():
+            if k not in meta or policy != "first":
+                meta[k] = None if k == "habits" else v
+        for h in data.get("habits", []):
+            hid = h.get("id")
+            if not hid:
+                continue
+            stats["habits"] += 1
+            td = h.get("trackingDurations") or {}
+            dcs = h.get("dailyCompletionStatus") or {}
+            entry = index.get(hid)
+            if entry is None:
+                index[hid] = {"habit": h, "td": dict(td), "dcs": dict(dcs)}
+                stats["sessions"] += len(td)
+                continue
+            if policy != "first":
+                entry["habit"] = h
+            mtd = entry["td"]
+            for k, v in td.items():
+                stats["sessions"] += 1
+                cur = mtd.get(k)
+                if cur is None:
+                    mtd[k] = v
+                elif cur != v:
+                    stats["conflicts"] += 1
+                    if policy == "last" or (policy == "max" and sum(v) > sum(cur)):
+                        mtd[k] = v
+            mdcs = entry["dcs"]
+            for k, v in dcs.items():
+                cur = mdcs.get(k)
+                if cur is None or policy == "last":
+                    mdcs[k] = v
+                elif policy == "max":
+                    mdcs[k] = bool(cur or v)
+        del data
+    habits = []
+    for entry in index.values():
+        h = dict(entry["habit"])
+        if "totalDuration" in h:
+            h["totalDuration"] = sum(int(x) for v in entry["td"].values() for x in v)
+        if "currentDays" in h:
+            h["currentDays"] = sum(1 for v in entry["dcs"].values() if v)
+        h["trackingDurations"] = entry["td"]
+        h["dailyCompletionStatus"] = entry["dcs"]
+        habits.append(h)
+    meta.setdefault("habits", None)
+    merged = {k: (habits if k == "habits" else v) for k, v in meta.items()}
+    return merged, stats
+
+def merge_main(argv):
+    p = argparse.ArgumentParser(prog="generate_tracking_data.py merge")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--outdir", default=None)
+    p.add_argument("--policy", choices=MERGE_POLICIES, default="last")
+    p.add_argument("--indent", type=int, default=4)
+    p.add_argument("--compact", action="store_true")
+    p.add_argument("--format", choices=["json", "ndjson"], default="json")
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--shard_by", choices=["habit", "month"], default="habit")
+    args = p.parse_args(argv)
+    backups = find_backups(args.inputs)
+    merged, stats = merge_backups(backups, policy=args.policy)
+    target_dir = Path(args.outdir) if args.outdir else backups[0].parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    ts = str(int(time.time() * 1000))
+
+    def gen_habit(h):
+        td = h["trackingDurations"]
+        dcs = h["dailyCompletionStatus"]
+        h["trackingDurations"] = {}
+        h["dailyCompletionStatus"] = {}
+        yield None, td, dcs
+
+    if args.format == "ndjson":
+        out_path = write_shards(target_dir / f"contrail_backup_{ts}.shards", merged, gen_habit,
+                                shards=args.shards, shard_by=args.shard_by)
+    else:
+        out_path = target_dir / f"contrail_backup_{ts}.json"
+        stream_backup(out_path, merged, gen_habit, indent=(None if args.compact else args.indent))
+    print(f"MERGE files={stats['files']} habits={len(merged['habits'])} sessions_in={stats['sessions']} "
+          f"conflicts={stats['conflicts']} policy={args.policy}")
+    print(str(out_path))
+
+class SnapshotStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.snapshots = self.root / "snapshots"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.snapshots.mkdir(parents=True, exist_ok=True)
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / f"{digest}.json"
+
+    def put(self, obj, stats):
+        raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        p = self.object_path(digest)
+        stats["chunks"] += 1
+        if not p.exists():
+            p.parent.mkdir(exist_ok=True)
+            tmp = p.with_suffix(".tmp")
+            tmp.write_bytes(raw)
+            os.replace(tmp, p)
+            stats["new_chunks"] += 1
+            stats["new_bytes"] += len(raw)
+        return digest
+
+    def get(self, digest):
+        return load_json(self.object_path(digest))
+
+    def add(self, backup_path, name=None):
+        data = load_json(backup_path)
+        stats = {"chunks": 0, "new_chunks": 0, "new_bytes": 0}
+        habits = []
+        for h in data.get("habits", []):
+            months = {}
+            for k, v in (h.get("trackingDurations") or {}).items():
+                months.setdefault(month_key_from_ts(k), ({}, {}))[0][k] = v
+            for k, v in (h.get("dailyCompletionStatus") or {}).items():
+                months.setdefault(month_key_from_ts(k), ({}, {}))[1][k] = v
+            skeleton = {k: h.get(k, {}) for k in habit_keys(h)}
+            skeleton["trackingDurations"] = {}
+            skeleton["dailyCompletionStatus"] = {}
+            habits.append({
+                "id": h.get("id"),
+                "meta": self.put(skeleton, stats),
+                "months": [[mk, self.put({"trackingDurations": td, "dailyCompletionStatus": dcs}, stats)]
+                           for mk, (td, dcs) in months.items()],
+            })
+        snapshot_id = name or Path(backup_path).stem.replace("contrail_backup_", "")
+        manifest = {
+            "id": snapshot_id,
+            "created": int(time.time() * 1000),
+            "source": Path(backup_path).name,
+            "keys": list(data.keys()),
+            "meta": self.put({k: v for k, v in data.items() if k != "habits"}, stats),
+            "habits": habits,
+            "stats": stats,
+        }
+        save_json(self.snapshots / f"{snapshot_id}.json", manifest)
+        return manifest
+
+    def list(self):
+        return [load_json(p) for p in sorted(self.snapshots.glob("*.json"))]
+
+    def restore(self, snapshot_id, out_path, indent=4):
+        manifest = load_json(self.snapshots / f"{snapshot_id}.json")
+        meta = self.get(manifest["meta"])
+        data = {k: ([{} for _ in manifest["habits"]] if k == "habits" else meta[k]) for k in manifest["keys"]}
+        pending = iter(manifest["habits"])
+
+        def gen_habit(h):
+            entry = next(pending)
+            h.update(self.get(entry["meta"]))
+            for mk, digest in entry["months"]:
+                chunk = self.get(digest)
+                yield mk, chunk["trackingDurations"], chunk["dailyCompletionStatus"]
+
+        stream_backup(out_path, data, gen_habit, indent=indent)
+        return out_path
+
+    def remove(self, snapshot_id):
+        (self.snapshots / f"{snapshot_id}.json").unlink()
+
+    def gc(self):
+        live = set()
+        for m in self.list():
+            live.add(m["meta"])
+            for h in m["habits"]:
+                live.add(h["meta"])
+                live.update(d for _, d in h["months"])
+        removed = freed = 0
+        for p in self.objects.glob("*/*.json"):
+            if p.stem not in live:
+                freed += p.stat().st_size
+                p.unlink()
+                removed += 1
+        return removed, freed
+
+def store_main(argv):
+    p = argparse.ArgumentParser(prog="generate_tracking_data.py store")
+    p.add_argument("--store", default="contrail_snapshots")
+    sub = p.add_subparsers(dest="action", required=True)
+    a = sub.add_parser("add")
+    a.add_argument("backups", nargs="+")
+    a.add_argument("--name", default=None)
+    sub.add_parser("list")
+    r = sub.add_parser("restore")
+    r.add_argument("snapshot")
+    r.add_argument("--out", default=None)
+    r.add_argument("--indent", type=int, default=4)
+    r.add_argument("--compact", action="store_true")
+    rm = sub.add_parser("rm")
+    rm.add_argument("snapshots", nargs="+")
+    sub.add_parser("gc")
+    args = p.parse_args(argv)
+    store = SnapshotStore(args.store)
+    if args.action == "add":
+        backups = find_backups(args.backups)
+        if args.name and len(backups) != 1:
+            p.error("--name needs exactly one backup")
+        for b in backups:
+            m = store.add(b, name=args.name)
+            st = m["stats"]
+            print(f"STORE_ADD {m['id']} chunks={st['chunks']} new_chunks={st['new_chunks']} "
+                  f"new_bytes={st['new_bytes']}")
+    elif args.action == "list":
+        for m in store.list():
+            print(f"{m['id']} source={m['source']} habits={len(m['habits'])} chunks={m['stats']['chunks']}")
+    elif args.action == "restore":
+        out = args.out or f"contrail_backup_{args.snapshot}.json"
+        store.restore(args.snapshot, out, indent=(None if args.compact else args.indent))
+        print(out)
+    elif args.action == "rm":
+        for sid in args.snapshots:
+            store.remove(sid)
+            print(f"STORE_RM {sid}")
+    else:
+        removed, freed = store.gc()
+        print(f"STORE_GC removed={removed} freed_bytes={freed}")
+
+def unshard_main(argv):
+    p = argparse.ArgumentParser(prog="generate_tracking_data.py unshard")
+    p.add_argument("--manifest", required=True)
+    p.add_argument("--out", default=None)
+    p.add_argument("--indent", type=int, default=4)
+    p.add_argument("--compact", action="store_true")
+    p.add_argument("--no_verify_checksums", action="store_true")
+    args = p.parse_args(argv)
+    manifest = Path(args.manifest)
+    out = args.out or str(manifest.parent.parent / manifest.parent.name.replace(".shards", ".json"))
+    unshard(manifest, out, indent=(None if args.compact else args.indent), verify=not args.no_verify_checksums)
+    print(out)
+
+COMMANDS = {
+    "verify": verify_main,
+    "unshard": unshard_main,
+    "extract": extract_main,
+    "merge": merge_main,
+    "store": store_main,
+}
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
     p = argparse.ArgumentParser()
-    p.add_argument("--source", required=True)
-    p.add_argument("--aggregates", required=True)
+    p.add_argument("--source", default=None)
+    p.add_argument("--aggregates", default=None)
     p.add_argument("--outdir", default=None)
     p.add_argument("--tolerance_ms", type=int, default=0)
     p.add_argument("--strict", action="store_true")
@@ -357,16 +2017,112 @@ def main():
     p.add_argument("--min_weekend_per_day", type=int, default=0)
     p.add_argument("--weekend_cap_min", type=int, default=None)
     p.add_argument("--weekend_cap_max", type=int, default=None)
+    p.add_argument("--stream", action="store_true")
+    p.add_argument("--indent", type=int, default=4)
+    p.add_argument("--compact", action="store_true")
+    p.add_argument("--engine", choices=["python", "numpy"], default="python")
+    p.add_argument("--allocator", choices=["exact", "legacy"], default="exact")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--hour_profile", default=None)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--cache_dir", default=None)
+    p.add_argument("--cache_max_mb", type=int, default=512)
+    p.add_argument("--format", choices=["json", "ndjson"], default="json")
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--shard_by", choices=["habit", "month"], default="habit")
+    p.add_argument("--ensure_ascii", action="store_true")
+    p.add_argument("--json_backend", choices=("auto",) + JSON_BACKENDS, default="auto")
+    p.add_argument("--watch", action="store_true")
+    p.add_argument("--watch_interval", type=float, default=0.5)
+    p.add_argument("--out", default=None)
+    p.add_argument("--profile", action="store_true")
+    p.add_argument("--profile_out", default=None)
+    p.add_argument("--profile_memory", action="store_true")
+    p.add_argument("--cprofile", type=int, default=0)
+    p.add_argument("--scale", action="store_true")
+    p.add_argument("--habits", type=int, default=100)
+    p.add_argument("--years", type=int, default=1)
+    p.add_argument("--start_year", type=int, default=None)
+    p.add_argument("--track_ratio", type=float, default=0.7)
+    p.add_argument("--sessions_per_month", type=float, default=30)
+    p.add_argument("--session_minutes", type=float, default=40)
+    p.add_argument("--checkins_per_month", type=float, default=20)
+    p.add_argument("--spread", type=float, default=0.5)
     args = p.parse_args()
-    process(args.source, args.aggregates, args.outdir,
-            tolerance_ms=args.tolerance_ms, strict=args.strict,
-            weekday_cap=args.weekday_cap, weekend_cap=args.weekend_cap,
-            weekday_weight=args.weekday_weight, weekend_weight=args.weekend_weight,
-            max_weekend_ratio=args.max_weekend_ratio,
-            shuffle_allocation=(not args.no_shuffle_allocation),
-            min_weekend_per_day=args.min_weekend_per_day,
-            weekend_cap_min=args.weekend_cap_min,
-            weekend_cap_max=args.weekend_cap_max)
+    if not args.scale and not (args.source and args.aggregates):
+        p.error("--source and --aggregates are required unless --scale is given")
+    set_json_backend(args.json_backend)
+    hour_profile = None
+    if args.hour_profile:
+        try:
+            hour_profile = load_hour_profile(args.hour_profile)
+        except (OSError, ValueError) as e:
+            p.error(f"--hour_profile: {e}")
+    if args.watch:
+        if args.scale or args.format != "json":
+            p.error("--watch needs --source/--aggregates and --format json")
+        if args.engine == "numpy" and np is None:
+            raise SystemExit("engine 'numpy' requires numpy to be installed")
+        params = make_params(args.weekday_cap, args.weekend_cap, args.weekday_weight, args.weekend_weight,
+                             args.max_weekend_ratio, not args.no_shuffle_allocation, args.min_weekend_per_day,
+                             args.weekend_cap_min, args.weekend_cap_max, args.engine, args.allocator, args.seed,
+                             hour_profile)
+        target_dir = Path(args.outdir) if args.outdir else Path(args.source).parent
+        target_dir.mkdir(parents=True, exist_ok=True)
+        out = args.out or str(target_dir / "contrail_backup_watch.json")
+        try:
+            watch(args.source, args.aggregates, out, params, indent=(None if args.compact else args.indent),
+                  ensure_ascii=args.ensure_ascii, tolerance_ms=args.tolerance_ms, interval=args.watch_interval)
+        except KeyboardInterrupt:
+            pass
+        return
+    scale = None
+    if args.scale:
+        scale = {
+            "habits": args.habits,
+            "years": args.years,
+            "start_year": args.start_year,
+            "track_ratio": args.track_ratio,
+            "sessions_per_month": args.sessions_per_month,
+            "session_minutes": args.session_minutes,
+            "checkins_per_month": args.checkins_per_month,
+            "spread": args.spread,
+        }
+    run = lambda: process(args.source, args.aggregates, args.outdir,
+                          tolerance_ms=args.tolerance_ms, strict=args.strict,
+                          weekday_cap=args.weekday_cap, weekend_cap=args.weekend_cap,
+                          weekday_weight=args.weekday_weight, weekend_weight=args.weekend_weight,
+                          max_weekend_ratio=args.max_weekend_ratio,
+                          shuffle_allocation=(not args.no_shuffle_allocation),
+                          min_weekend_per_day=args.min_weekend_per_day,
+                          weekend_cap_min=args.weekend_cap_min,
+                          weekend_cap_max=args.weekend_cap_max,
+                          stream=args.stream,
+                          indent=(None if args.compact else args.indent),
+                          engine=args.engine,
+                          allocator=args.allocator,
+                          seed=args.seed,
+                          workers=args.workers,
+                          cache_dir=args.cache_dir,
+                          cache_max_mb=args.cache_max_mb,
+                          scale=scale,
+                          output_format=args.format,
+                          shards=args.shards,
+                          shard_by=args.shard_by,
+                          profile=args.profile,
+                          profile_out=args.profile_out,
+                          profile_memory=args.profile_memory,
+                          ensure_ascii=args.ensure_ascii,
+                          hour_profile=hour_profile)
+    if not args.cprofile:
+        return run()
+    import cProfile
+    import pstats
+    cp = cProfile.Profile()
+    cp.runcall(run)
+    pstats.Stats(cp).sort_stats("cumulative").print_stats(args.cprofile)
+    if args.profile_out:
+        cp.dump_stats(str(Path(args.profile_out).with_suffix(".prof")))
 
 if __name__ == "__main__":
     main()
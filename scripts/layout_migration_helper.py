@@ -12,19 +12,126 @@
 4. 更新迁移跟踪表
 """
 
+import argparse
+import difflib
+import hashlib
 import os
 import re
 import sys
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-# 支持的ScreenUtil调用模式
+# 支持的ScreenUtil调用模式（旧版三遍扫描，仅保留用于基准对比）
 SCREENUTIL_PATTERNS = {
     'width': re.compile(r'ScreenUtil\(\)\.setWidth\(([^)]+)\)'),
     'height': re.compile(r'ScreenUtil\(\)\.setHeight\(([^)]+)\)'),
     'sp': re.compile(r'ScreenUtil\(\)\.setSp\(([^)]+)\)')
 }
 
+# 单遍组合扫描：先用以 "." 开头的单一模式找出候选的 .setXxx(...) 调用和 .w / .sp 扩展，
+# 再只对含候选的文件、只扫描到最后一个候选为止，切分出注释和字符串字面量并丢弃落在其中的候选。
+# re 能直接定位单个字面首字符，多个首字符的组合模式只能逐字符判断（约为前者的数倍耗时），
+# 因此调用和字面量分成两个模式，字面量的起始位置用 str.find 查找；
+# ScreenUtil() 前缀和扩展前的数字都由 scan_content 回看确认
+CALL_PATTERN = re.compile(r'\.(?:(?P<ext>w|h|sp)\b|set(?P<call>Width|Height|Sp)\((?P<arg>[^)]+)\))')
+CALL_PREFIX = 'ScreenUtil()'
+
+# 注释和不含 ${...} 插值的完整字符串整体跳过；含插值（或未闭合）的字符串只匹配起始引号，
+# 由 STRING_TAIL 继续扫描到插值或结束引号，插值内的表达式按代码处理
+LITERAL_SOURCE = r"""
+    //[^\n]*
+  | /\*.*?\*/
+  | '''[^'\\$]*(?:(?:\\.|\$(?!\{)|'(?!''))[^'\\$]*)*'''
+  | \"\"\"[^"\\$]*(?:(?:\\.|\$(?!\{)|"(?!""))[^"\\$]*)*\"\"\"
+  | '[^'\\\n$]*(?:(?:\\.|\$(?!\{))[^'\\\n$]*)*'
+  | "[^"\\\n$]*(?:(?:\\.|\$(?!\{))[^"\\\n$]*)*"
+  | '(?P<single>(?:'')?)
+  | "(?P<double>(?:"")?)
+"""
+LITERAL_PATTERN = re.compile(LITERAL_SOURCE, re.S | re.X)
+LITERAL_STARTS = '/\'"'
+# 插值表达式内额外跟踪花括号，与 ${ 配对的 } 结束插值
+INTERPOLATION_PATTERN = re.compile(LITERAL_SOURCE + r'  | (?P<brace>[{}])', re.S | re.X)
+# 原始字符串（r'...'）不转义也不插值
+RAW_STRING_PATTERN = re.compile(r"'''.*?'''|\"\"\".*?\"\"\"|'[^'\n]*'|\"[^\"\n]*\"", re.S)
+# 字符串起始引号之后的内容，停在结束引号或 ${ 处；单行字符串遇到换行即视为结束
+STRING_TAIL = {
+    quote: re.compile((
+        r'[^{0}\\$]*(?:(?:\\.|\$(?!\{{)|{0}(?!{0}{0}))[^{0}\\$]*)*(?:{0}{0}{0}|(?P<interp>\$\{{))?' if len(quote) == 3 else
+        r'[^{0}\\$\n]*(?:(?:\\.|\$(?!\{{))[^{0}\\$\n]*)*(?:{0}|(?P<interp>\$\{{))?'
+    ).format(quote[0]), re.S)
+    for quote in ("'", '"', "'''", '"""')
+}
+
+NUMERIC_PATTERN = re.compile(r'^-?\d+(?:\.\d+)?$')
+
+# 调用形式到参数类型的映射
+CALL_TYPES = {'Width': 'width', 'Height': 'height', 'Sp': 'sp'}
+EXT_TYPES = {'w': 'width', 'h': 'height', 'sp': 'sp'}
+
+# 参数类型对应的常量名前缀和ScreenUtil方法
+CONSTANT_PREFIXES = {'width': 'width', 'height': 'height', 'sp': 'fontSize'}
+SCREENUTIL_SETTERS = {'width': 'setWidth', 'height': 'setHeight', 'sp': 'setSp'}
+
+# 常量类文件和导入语句
+CONSTANTS_FILE = os.path.join('lib', 'shared', 'utils', 'page_layout_constants.dart')
+CONSTANTS_IMPORT = "import 'package:contrail/shared/utils/page_layout_constants.dart';"
+SCREENUTIL_IMPORT = "import 'package:flutter_screenutil/flutter_screenutil.dart';"
+
+# 自动迁移区块中生成的常量（如 width_16、fontSize_12_5），
+# 以及驻留后引用 BaseLayoutConstants 共享常量的 getter
+CONSTANT_NAME = r'(?:width|height|fontSize)_m?\d+(?:_\d+)?'
+GENERATED_CONSTANT = re.compile(
+    rf'^  static (?:final double ({CONSTANT_NAME}) = ScreenUtil\(\)\.set\w+\([^)]*\)'
+    rf'|double get ({CONSTANT_NAME}) => BaseLayoutConstants\.\2);\n', re.M)
+GENERATED_HEADER = '  // 自动迁移生成的参数（layout_migration_helper.py --apply）\n'
+
+# 判断文件是否仍依赖ScreenUtil：剩余的 ScreenUtil 引用或任意 .w/.h/.r/.sp 等扩展调用
+SCREENUTIL_USAGE = re.compile(r'\bScreenUtil\w*\b|\.(?:w|h|r|sp|sw|sh|dm|dg|sm)\b')
+
+# 作用域分析：跳过注释和字符串，识别括号、箭头函数和语句分隔符
+SCOPE_PATTERN = re.compile(r"""
+    //[^\n]*
+  | /\*.*?\*/
+  | '''.*?'''
+  | \"\"\".*?\"\"\"
+  | '[^'\\\n]*(?:\\.[^'\\\n]*)*'
+  | "[^"\\\n]*(?:\\.[^"\\\n]*)*"
+  | (?P<tok>=>|[{}()\[\];,])
+""", re.S | re.X)
+# 倒序源码中 pos 之前的标识符（可带一层泛型参数）
+REVERSED_IDENT = re.compile(r'\s*(?:>[^()<>;{}]*<\s*)?([\w$.]+)')
+CLASS_PATTERN = re.compile(r'\b(?:class|mixin|extension)\s+([A-Za-z_$][\w$]*)')
+BODY_MODIFIERS = re.compile(r'\s*(?:async\*?|sync\*)?\s*')
+CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'await'}
+
+# 每帧执行的作用域：build 方法及其 _buildXxx 辅助方法、各类 builder 回调、
+# 列表项构建回调（每个可见列表项执行一次）和动画回调（动画期间每帧执行）。
+# 其余闭包沿用外层作用域，onTap 等事件回调除外；其余方法在被每帧作用域调用时同样视为每帧执行
+BUILD_CALLBACK = re.compile(r'^_?build(?:[A-Z_]\w*)?$|[bB]uilder$')
+EVENT_CALLBACK = re.compile(r'^on[A-Z]')
+ITEM_CALLBACKS = {'itemBuilder', 'separatorBuilder', 'SliverChildBuilderDelegate'}
+ANIMATION_CALLBACKS = {'addListener', 'paint', 'onTick', 'createTicker', 'Ticker'}
+ANIMATION_OWNERS = {'AnimatedBuilder', 'TweenAnimationBuilder'}
+# 估算每帧调用次数时各类作用域的权重，列表项按一屏约 8 个可见项估算
+FRAME_WEIGHTS = {'build': 1, 'item': 8, 'animation': 1}
+
+# 项目根目录（默认取脚本所在仓库）
+DEFAULT_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 迁移日志目录和跟踪表（相对项目根目录）
+LOG_DIR = os.path.join('docs', '迁移日志')
+TRACKING_FILE = os.path.join('docs', '页面布局参数迁移跟踪表.md')
+
+# 扫描缓存（相对项目根目录），格式变化时递增版本号使旧缓存失效
+CACHE_FILE = os.path.join('.dart_tool', 'layout_migration_cache.json')
+CACHE_VERSION = 2
+
+# 待分析文件少于该数量时直接在当前进程分析，避免进程池启动开销
+PARALLEL_MIN_FILES = 8
+
 # 页面到常量类的映射关系
 PAGE_TO_CONSTANT_CLASS = {
     # 习惯模块页面
@@ -62,52 +169,552 @@ PAGE_TO_CONSTANT_CLASS = {
     'clock_widget.dart': 'ClockWidgetConstants'
 }
 
-def analyze_file(file_path):
+def number_start(content, dot):
     """
-    分析文件中的ScreenUtil调用
-    返回包含调用次数和参数值的字典
+    从扩展调用的 "." 位置向前回看数字字面量（如 16 或 16.5），返回其起始偏移；
+    不是独立的数字字面量（例如 size.w、a1.w）时返回 None
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"错误：无法读取文件 {file_path}: {e}")
+    i = dot
+    while i > 0 and content[i - 1].isdigit():
+        i -= 1
+    if i == dot:
         return None
-    
-    results = {
-        'width': [],
-        'height': [],
-        'sp': []
-    }
-    
-    # 搜索所有ScreenUtil调用
+    if i > 1 and content[i - 1] == '.' and content[i - 2].isdigit():
+        i -= 1
+        while i > 0 and content[i - 1].isdigit():
+            i -= 1
+    if i > 0 and (content[i - 1].isalnum() or content[i - 1] in '_$.'):
+        return None
+    return i
+
+def literal_spans(content, stop=None):
+    """
+    依次返回源码中注释和字符串字面量的 (起始, 结束) 偏移，扫描到 stop 为止。
+    含 ${...} 插值的字符串按片段返回，插值内的表达式视为代码，不包含在任何区间内
+    """
+    stop = len(content) if stop is None else stop
+    # 外层字符串的 (引号, 插值内花括号深度)，每进入一层 ${ 压入一项
+    outer = []
+    depth = 0
+    quote = None
+    pos = 0
+    # 代码中各字面量起始字符的下一个位置，用 str.find 跳过代码
+    upcoming = dict.fromkeys(LITERAL_STARTS, -1)
+    while pos <= stop:
+        if quote is not None:
+            m = STRING_TAIL[quote].match(content, pos)
+            yield pos, m.end()
+            pos = m.end()
+            if m.group('interp'):
+                outer.append((quote, depth))
+                depth = 0
+            quote = None
+            continue
+        if outer:
+            m = INTERPOLATION_PATTERN.search(content, pos)
+            if m is None:
+                return
+        else:
+            for char, at in upcoming.items():
+                if at < pos:
+                    at = content.find(char, pos)
+                    upcoming[char] = len(content) if at < 0 else at
+            at = min(upcoming.values())
+            if at >= len(content):
+                return
+            m = LITERAL_PATTERN.match(content, at)
+            if m is None:
+                # 除号等单独的 "/"
+                pos = at + 1
+                continue
+        start, pos = m.span()
+        kind = m.lastgroup
+        if kind == 'brace':
+            if m.group() == '{':
+                depth += 1
+            elif depth:
+                depth -= 1
+            else:
+                quote, depth = outer.pop()
+            continue
+        if content[start] != '/' and start and content[start - 1] == 'r' and \
+                not (start > 1 and (content[start - 2].isalnum() or content[start - 2] in '_$')):
+            raw = RAW_STRING_PATTERN.match(content, start)
+            pos = raw.end() if raw else start + 1
+        elif kind is not None:
+            quote = m.group()
+        yield start, pos
+
+def scan_content(content):
+    """
+    单遍扫描源码，返回所有ScreenUtil调用（含扩展写法）的列表
+    每项包含类型、写法、数值、原始文本、行号、列号和偏移量；
+    注释和字符串中的匹配会被跳过，字符串插值 ${...} 中的调用照常识别
+    """
+    hits = list(CALL_PATTERN.finditer(content))
+    if not hits:
+        return []
+    spans = literal_spans(content, hits[-1].start())
+    span_start = span_end = -1
+    calls = []
+    line = 1
+    line_start = 0
+    pos = 0
+    for m in hits:
+        dot = m.start()
+        while span_end <= dot:
+            span_start, span_end = next(spans, (len(content) + 1, len(content) + 1))
+        if span_start <= dot:
+            # 注释或字符串字面量中的匹配
+            continue
+        if m.group('call'):
+            start = dot - len(CALL_PREFIX)
+            if start < 0 or not content.startswith(CALL_PREFIX, start):
+                continue
+            param_type = CALL_TYPES[m.group('call')]
+            form = 'call'
+            # 兼容多行调用中的尾随逗号，如 setWidth(\n  20,\n)
+            arg = m.group('arg').strip().rstrip(',').strip()
+            value = float(arg) if NUMERIC_PATTERN.match(arg) else None
+        else:
+            start = number_start(content, dot)
+            if start is None:
+                continue
+            param_type = EXT_TYPES[m.group('ext')]
+            form = 'ext'
+            arg = content[start:dot]
+            value = float(arg)
+        # 增量计算行列号，避免对每个匹配重新统计换行
+        newlines = content.count('\n', pos, start)
+        if newlines:
+            line += newlines
+            line_start = content.rfind('\n', pos, start) + 1
+        pos = start
+        calls.append({
+            'type': param_type,
+            'form': form,
+            'value': value,
+            'arg': arg,
+            'text': content[start:m.end()],
+            'line': line,
+            'column': start - line_start + 1,
+            'start': start,
+            'end': m.end(),
+        })
+    return calls
+
+def scan_content_legacy(content):
+    """
+    旧版三遍 findall 扫描，仅识别 ScreenUtil().setXxx(...) 写法，用于基准对比
+    """
+    results = {'width': [], 'height': [], 'sp': []}
     for param_type, pattern in SCREENUTIL_PATTERNS.items():
-        matches = pattern.findall(content)
-        for match in matches:
-            # 清理数值
+        for match in pattern.findall(content):
             value = match.strip()
-            # 检查是否是数字
             if value.isdigit() or (value.startswith('-') and value[1:].isdigit()) or re.match(r'^\d+\.\d+$', value):
                 results[param_type].append(float(value))
+    return results
+
+def word_before(content, pos, reversed_content=None):
+    """
+    向前回看 pos 之前的标识符（允许 a.b 形式和紧随的泛型参数，如 map<Widget>），
+    返回 (标识符, 起始偏移)，没有时返回 (None, pos)。
+    传入倒序的源码时用锚定匹配代替逐字符回看
+    """
+    if reversed_content is None:
+        reversed_content = content[:pos][::-1]
+        offset = 0
+    else:
+        offset = len(content) - pos
+    m = REVERSED_IDENT.match(reversed_content, offset)
+    if m is None:
+        return None, pos
+    name = m.group(1)[::-1].lstrip('0123456789.')
+    return (name, pos - (m.end() - offset)) if name else (None, pos)
+
+def frame_kind(name, owner, closure):
+    """
+    判断函数体是否每帧执行：返回 'build'、'item'、'animation'，
+    沿用外层作用域时返回 'inherit'，否则返回 None
+    """
+    if name in ITEM_CALLBACKS:
+        return 'item'
+    if name in ANIMATION_CALLBACKS or owner in ANIMATION_OWNERS:
+        return 'animation'
+    if BUILD_CALLBACK.search(name):
+        return 'build'
+    if closure and not EVENT_CALLBACK.match(name):
+        return 'inherit'
+    return None
+
+def attribute_scopes(content, calls):
+    """
+    为每个调用标注所在的方法或闭包（call['scope']，如 HabitItemWidget.build > itemBuilder）
+    以及所在作用域的每帧类型（call['frame']）。
+    按括号嵌套维护作用域栈，箭头函数体在同层的 ","、";" 或外层右括号处结束；
+    被每帧作用域调用的同文件方法按调用关系传播每帧类型。
+    返回 (文件中声明的类名, 在列表项构建回调中创建的组件类名)
+    """
+    root = {'label': '', 'kind': None, 'parent': None, 'class': False}
+    # 栈元素: (结束符, 调用方名称, 作用域节点, 左括号偏移)，箭头函数体的结束符为 None
+    stack = [(None, None, root, 0)]
+    methods = {}
+    invocations = []
+    classes = set()
+    last_paren = None
+    pending = sorted(calls, key=lambda c: c['start'])
+    index = 0
+    next_start = pending[0]['start'] if pending else len(content) + 1
+    reversed_content = content[::-1]
     
-    # 统计唯一值
-    unique_values = {
-        'width': list(set(results['width'])),
-        'height': list(set(results['height'])),
-        'sp': list(set(results['sp']))
-    }
+    def open_body(pos):
+        # 判断 pos 处的 "{" 或 "=>" 打开的作用域：函数体、类体或普通代码块
+        parent = stack[-1][2]
+        if last_paren is not None and BODY_MODIFIERS.fullmatch(content, last_paren[2], pos):
+            open_pos, callee = last_paren[:2]
+            if callee and callee.split('.')[-1] in CONTROL_KEYWORDS:
+                return parent
+            closure = not callee
+            if callee:
+                # 方法声明，如 Widget build(BuildContext context) {
+                name = owner = callee.split('.')[-1]
+            else:
+                # 闭包：具名参数（itemBuilder: (context, index) {）或所在调用的位置参数
+                i = open_pos
+                while i > 0 and content[i - 1].isspace():
+                    i -= 1
+                named = word_before(content, i - 1, reversed_content)[0] if i > 0 and content[i - 1] == ':' else None
+                owner = stack[-1][1] or ''
+                name = named or owner.split('.')[-1]
+        else:
+            name, start = word_before(content, pos, reversed_content)
+            if name is None or word_before(content, start, reversed_content)[0] != 'get':
+                # 类声明的头部位于上一个 ";"、"{" 或 "}" 之后
+                if content[pos] == '{':
+                    header = max(content.rfind(c, 0, pos) for c in ';{}') + 1
+                    cls = CLASS_PATTERN.search(content, header, pos)
+                    if cls is not None:
+                        classes.add(cls.group(1))
+                        return {'label': cls.group(1), 'kind': None, 'parent': parent, 'class': True}
+                return parent
+            owner = name
+            closure = False
+        label = f"{parent['label']}.{name}" if parent['class'] else \
+            (f"{parent['label']} > {name}" if parent['label'] else name)
+        node = {'label': label, 'kind': frame_kind(name, owner, closure), 'parent': parent, 'class': False}
+        if parent['class'] or parent is root:
+            methods.setdefault(name, []).append(node)
+        return node
+    
+    for m in SCOPE_PATTERN.finditer(content):
+        tok = m.group('tok')
+        if tok is None:
+            continue
+        pos = m.start()
+        while next_start < pos:
+            pending[index]['node'] = stack[-1][2]
+            index += 1
+            next_start = pending[index]['start'] if index < len(pending) else len(content) + 1
+        if tok in '([':
+            callee = word_before(content, pos, reversed_content)[0] if tok == '(' else None
+            if callee:
+                invocations.append((callee, stack[-1][2]))
+            stack.append((')' if tok == '(' else ']', callee, stack[-1][2], pos))
+        elif tok == '{':
+            stack.append(('}', None, open_body(pos), pos))
+        elif tok == '=>':
+            stack.append((None, None, open_body(pos), pos))
+        else:
+            while len(stack) > 1 and stack[-1][0] is None:
+                stack.pop()
+            if tok in ')]}' and len(stack) > 1:
+                frame = stack.pop()
+                if tok == ')':
+                    last_paren = (frame[3], frame[1], m.end())
+                    continue
+        last_paren = None
+    for call in pending[index:]:
+        call['node'] = stack[-1][2]
+    
+    def effective(node):
+        while node['kind'] == 'inherit':
+            node = node['parent']
+        return node['kind']
+    
+    # 按调用关系传播：被每帧作用域调用的方法取权重更高的每帧类型，直到不再变化
+    local = [(callee, node) for callee, node in invocations if callee.split('.')[-1] in methods]
+    changed = True
+    while changed:
+        changed = False
+        for callee, node in local:
+            kind = effective(node)
+            if kind is None:
+                continue
+            for target in methods.get(callee.split('.')[-1], ()):
+                if FRAME_WEIGHTS[kind] > FRAME_WEIGHTS.get(effective(target), 0):
+                    target['kind'] = kind
+                    changed = True
+    
+    for call in pending:
+        node = call.pop('node')
+        call['scope'] = node['label']
+        call['frame'] = effective(node)
+    item_widgets = {callee.split('.')[0] for callee, node in invocations
+                    if callee[:1].isupper() and effective(node) == 'item'}
+    return sorted(classes), sorted(item_widgets)
+
+def analyze_content(file_path, content):
+    """
+    分析源码中的ScreenUtil调用
+    返回包含调用次数、参数值和调用位置的字典
+    """
+    calls = scan_content(content)
+    classes, item_widgets = attribute_scopes(content, calls)
+    
+    # 统计唯一值（仅数值参数可迁移为常量）
+    unique_values = {'width': set(), 'height': set(), 'sp': set()}
+    for call in calls:
+        if call['value'] is not None:
+            unique_values[call['type']].add(call['value'])
     
     return {
         'file_path': file_path,
         'file_name': os.path.basename(file_path),
-        'total_calls': sum(len(v) for v in results.values()),
-        'unique_values': unique_values,
+        'total_calls': sum(1 for c in calls if c['value'] is not None),
+        'dynamic_calls': sum(1 for c in calls if c['value'] is None),
+        'classes': classes,
+        'item_widgets': item_widgets,
+        'unique_values': {k: sorted(v) for k, v in unique_values.items()},
+        'calls': calls,
         'constant_class': PAGE_TO_CONSTANT_CLASS.get(os.path.basename(file_path), 'BaseLayoutConstants')
     }
 
-def generate_constant_definitions(analysis_result):
+def analyze_file(file_path):
+    """
+    分析文件中的ScreenUtil调用
+    返回包含调用次数、参数值和调用位置的字典
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        print(f"错误：无法读取文件 {file_path}: {e}")
+        return None
+    
+    return analyze_content(file_path, content)
+
+def analyze_job(file_path):
+    """
+    进程池任务：读取文件、计算内容哈希并分析，读取失败时返回错误信息
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        st = os.stat(file_path)
+    except OSError as e:
+        return file_path, None, None, str(e)
+    stamp = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': hashlib.sha256(raw).hexdigest()}
+    return file_path, stamp, analyze_content(file_path, raw.decode('utf-8')), None
+
+def find_dart_files(root, only_pages=False):
+    """
+    遍历目录下的Dart文件，跳过测试目录和构建目录
+    """
+    dart_files = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in ('test', 'build') and not d.startswith('.'))
+        for file in sorted(files):
+            if file.endswith('.dart') and (not only_pages or file in PAGE_TO_CONSTANT_CLASS):
+                dart_files.append(os.path.join(dirpath, file))
+    return dart_files
+
+def benchmark(root, repeat=20):
+    """
+    在指定目录上对比旧版三遍扫描与单遍组合扫描的耗时和识别数量
+    """
+    contents = []
+    for file_path in find_dart_files(root):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+    
+    def timed(fn):
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            found = sum(fn(c) for c in contents)
+            samples.append(time.perf_counter() - t)
+        return min(samples), found
+    
+    legacy_time, legacy_found = timed(lambda c: sum(len(v) for v in scan_content_legacy(c).values()))
+    combined_time, combined_found = timed(lambda c: len(scan_content(c)))
+    numeric_found = sum(1 for c in contents for call in scan_content(c) if call['value'] is not None)
+    print(f"基准目录: {root} ({len(contents)} 个文件, {sum(len(c) for c in contents)} 字符)")
+    print(f"旧版三遍扫描: {legacy_time * 1000:.2f} ms, 识别 {legacy_found} 处")
+    print(f"单遍组合扫描: {combined_time * 1000:.2f} ms, 识别 {combined_found} 处 (数值参数 {numeric_found} 处)")
+    return {'legacy': (legacy_time, legacy_found), 'combined': (combined_time, combined_found)}
+
+def rank_frame_cost(analyses):
+    """
+    按估算的每帧调用次数对文件排序。
+    组件类在其他文件的列表项构建回调中创建时（如 HabitItemWidget），其 build 作用域按列表项权重计算
+    """
+    item_widgets = set()
+    for analysis in analyses:
+        item_widgets.update(analysis['item_widgets'])
+    ranking = []
+    for analysis in analyses:
+        in_item = bool(item_widgets & set(analysis['classes']))
+        counts = {kind: 0 for kind in FRAME_WEIGHTS}
+        scopes = {}
+        for call in analysis['calls']:
+            kind = 'item' if in_item and call['frame'] == 'build' else call['frame']
+            if kind is None:
+                continue
+            counts[kind] += 1
+            scopes[call['scope']] = scopes.get(call['scope'], 0) + FRAME_WEIGHTS[kind]
+        cost = sum(scopes.values())
+        if cost:
+            ranking.append({
+                'file': analysis['file_name'],
+                'cost': cost,
+                'counts': counts,
+                'other': len(analysis['calls']) - sum(counts.values()),
+                'in_item': in_item,
+                'scopes': sorted(scopes.items(), key=lambda x: (-x[1], x[0])),
+            })
+    ranking.sort(key=lambda r: (-r['cost'], r['file']))
+    return ranking
+
+def print_frame_report(ranking, top=20, top_scopes=3):
+    """
+    输出每帧调用估算排行，以及每个文件中开销最大的作用域
+    """
+    print(f"\n=== 每帧调用估算（build/动画回调权重 1，列表项权重 {FRAME_WEIGHTS['item']}）===")
+    for r in ranking[:top]:
+        counts = r['counts']
+        note = " [列表项组件]" if r['in_item'] else ""
+        print(f"{r['file']}: 约 {r['cost']} 次/帧 (build:{counts['build']}, item:{counts['item']}, "
+              f"animation:{counts['animation']}, 其他:{r['other']}){note}")
+        for scope, cost in r['scopes'][:top_scopes]:
+            print(f"    {scope}: {cost}")
+
+def load_scan_cache(cache_path):
+    """
+    读取扫描缓存，缓存不存在、损坏或版本不符时返回空缓存
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+def save_scan_cache(cache_path, entries):
+    """
+    原子写入扫描缓存
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'files': entries}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, cache_path)
+
+def file_unchanged(file_path, entry):
+    """
+    根据 mtime、大小和内容哈希判断文件是否与缓存一致；
+    mtime 或大小变化但内容哈希不变时同样视为未变化，并刷新缓存中的 mtime
+    """
+    if entry is None:
+        return False
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return False
+    if st.st_mtime_ns == entry['mtime_ns'] and st.st_size == entry['size']:
+        return True
+    try:
+        with open(file_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return False
+    if digest != entry['sha256']:
+        return False
+    entry['mtime_ns'] = st.st_mtime_ns
+    entry['size'] = st.st_size
+    return True
+
+def scan_project(root, dart_files, cache_path=None, workers=None):
+    """
+    分析项目中的Dart文件：命中缓存的文件直接复用分析结果，
+    其余文件使用进程池并行分析。
+    返回 (按文件顺序排列的分析结果, 本次重新分析的文件列表)
+    """
+    cached = load_scan_cache(cache_path) if cache_path else {}
+    entries = {}
+    results = {}
+    dirty = []
+    for file_path in dart_files:
+        rel = os.path.relpath(file_path, root)
+        entry = cached.get(rel)
+        if file_unchanged(file_path, entry):
+            entries[rel] = entry
+            results[file_path] = dict(entry['analysis'], file_path=file_path)
+        else:
+            dirty.append(file_path)
+    
+    pool = None
+    if len(dirty) >= PARALLEL_MIN_FILES and workers != 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        jobs = pool.map(analyze_job, dirty, chunksize=max(1, len(dirty) // ((workers or os.cpu_count() or 1) * 4)))
+    else:
+        jobs = map(analyze_job, dirty)
+    changed = []
+    try:
+        for file_path, stamp, analysis, error in jobs:
+            if error is not None:
+                print(f"错误：无法读取文件 {file_path}: {error}")
+                continue
+            rel = os.path.relpath(file_path, root)
+            entries[rel] = dict(stamp, analysis=dict(analysis, file_path=rel))
+            results[file_path] = analysis
+            changed.append(file_path)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    # 保留本次未扫描但仍存在的文件的缓存（例如只扫描页面文件时）
+    for rel, entry in cached.items():
+        if rel not in entries and os.path.exists(os.path.join(root, rel)):
+            entries[rel] = entry
+    if cache_path and (changed or set(entries) != set(cached)):
+        save_scan_cache(cache_path, entries)
+    return [results[f] for f in dart_files if f in results], changed
+
+def format_value(value):
+    """
+    数值参数转为Dart字面量，整数不带小数部分
+    """
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def constant_name(param_type, value):
+    """
+    生成常量名，如 width_16、height_8_5、fontSize_12；负数以 m 开头
+    """
+    text = format_value(abs(value)).replace('.', '_')
+    return f"{CONSTANT_PREFIXES[param_type]}_{'m' if value < 0 else ''}{text}"
+
+def constant_definition(param_type, value):
+    """
+    生成单个常量的定义语句
+    """
+    return (f"static final double {constant_name(param_type, value)} = "
+            f"ScreenUtil().{SCREENUTIL_SETTERS[param_type]}({format_value(value)});")
+
+def generate_constant_definitions(analysis_result, shared=frozenset()):
     """
-    根据分析结果生成常量定义代码
+    根据分析结果生成常量定义代码，shared 中的常量生成为引用 BaseLayoutConstants 的 getter
     """
     if not analysis_result:
         return None
@@ -127,24 +734,24 @@ def generate_constant_definitions(analysis_result):
     if unique_values['width']:
         definitions.append("  // 宽度相关参数")
         for value in sorted(unique_values['width']):
-            constant_name = f"width_{int(value)}" if value.is_integer() else f"width_{value}"
-            definitions.append(f"  static final double {constant_name} = ScreenUtil().setWidth({value});")
+            x = ('width', value)
+            definitions.append(f"  {constant_getter(*x) if x in shared else constant_definition(*x)}")
         definitions.append("")
     
     # 2. 高度相关
     if unique_values['height']:
         definitions.append("  // 高度相关参数")
         for value in sorted(unique_values['height']):
-            constant_name = f"height_{int(value)}" if value.is_integer() else f"height_{value}"
-            definitions.append(f"  static final double {constant_name} = ScreenUtil().setHeight({value});")
+            x = ('height', value)
+            definitions.append(f"  {constant_getter(*x) if x in shared else constant_definition(*x)}")
         definitions.append("")
     
     # 3. 字体大小相关
     if unique_values['sp']:
         definitions.append("  // 字体大小相关参数")
         for value in sorted(unique_values['sp']):
-            constant_name = f"fontSize_{int(value)}" if value.is_integer() else f"fontSize_{value}"
-            definitions.append(f"  static final double {constant_name} = ScreenUtil().setSp({value});")
+            x = ('sp', value)
+            definitions.append(f"  {constant_getter(*x) if x in shared else constant_definition(*x)}")
         definitions.append("")
     
     definitions.append("}")
@@ -173,9 +780,8 @@ def generate_migration_suggestions(analysis_result):
         if values:
             suggestions.append(f"// 2. {param_type.upper()} 替换建议:")
             for value in sorted(values):
-                original = f"ScreenUtil().set{param_type.capitalize()}({value})"
-                constant_name = f"{param_type}_{int(value)}" if value.is_integer() else f"{param_type}_{value}"
-                replaced = f"{constant_class}.{constant_name}"
+                original = f"ScreenUtil().{SCREENUTIL_SETTERS[param_type]}({format_value(value)})"
+                replaced = f"{constant_class}.{constant_name(param_type, value)}"
                 suggestions.append(f"// 将 `{original}` 替换为 `{replaced}`")
             suggestions.append("")
     
@@ -187,9 +793,9 @@ def generate_migration_suggestions(analysis_result):
     
     return '\n'.join(suggestions)
 
-def create_migration_log(analysis_result):
+def create_migration_log(analysis_result, root=DEFAULT_PROJECT_ROOT):
     """
-    创建迁移日志文件
+    创建迁移日志文件（位于项目根目录下的 docs/迁移日志/）
     """
     if not analysis_result:
         return None
@@ -200,7 +806,7 @@ def create_migration_log(analysis_result):
     unique_values = analysis_result['unique_values']
     
     # 创建日志目录
-    log_dir = '/Users/bytedance/traeProjects/Contrail/docs/迁移日志'
+    log_dir = os.path.join(root, LOG_DIR)
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
@@ -242,9 +848,8 @@ def create_migration_log(analysis_result):
     # 生成替换记录表格
     for param_type, values in unique_values.items():
         for value in sorted(values):
-            original = f"ScreenUtil().set{param_type.capitalize()}({value})"
-            constant_name = f"{param_type}_{int(value)}" if value.is_integer() else f"{param_type}_{value}"
-            replaced = f"{constant_class}.{constant_name}"
+            original = f"ScreenUtil().{SCREENUTIL_SETTERS[param_type]}({format_value(value)})"
+            replaced = f"{constant_class}.{constant_name(param_type, value)}"
             content.append(f"| {param_type}: {value} | `{original}` | `{replaced}` | 未替换 |")
     
     content.extend([
@@ -269,34 +874,327 @@ def create_migration_log(analysis_result):
         print(f"错误：无法创建迁移日志 {log_file}: {e}")
         return None
 
-def update_tracking_table(file_path, status="进行中"):
+def update_tracking_table(file_path, status="进行中", root=DEFAULT_PROJECT_ROOT, note=None, write=False):
     """
-    更新迁移跟踪表（简化版本）
-    实际项目中可以实现更复杂的Markdown表格解析和更新
+    更新迁移跟踪表
+    write 为 True 时直接改写跟踪表中对应文件路径的行（状态、日期和备注），
+    找不到对应行或未启用写入时打印提示，由人工更新
     """
-    tracking_file = '/Users/bytedance/traeProjects/Contrail/docs/页面布局参数迁移跟踪表.md'
+    tracking_file = os.path.join(root, TRACKING_FILE)
     file_name = os.path.basename(file_path)
     constant_class = PAGE_TO_CONSTANT_CLASS.get(file_name, 'BaseLayoutConstants')
     date = datetime.now().strftime('%Y-%m-%d')
     
+    if write and os.path.exists(tracking_file):
+        rel = os.path.relpath(os.path.abspath(file_path), root).replace(os.sep, '/')
+        with open(tracking_file, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        for i, line in enumerate(lines):
+            cells = line.split('|')
+            # | 名称 | 文件路径 | 常量类 | 状态 | 日期 | 负责人 | 备注 |
+            if len(cells) >= 9 and cells[2].strip() == rel:
+                cells[4] = f" {status} "
+                cells[5] = f" {date} "
+                if note:
+                    cells[7] = f" {note} "
+                lines[i] = '|'.join(cells)
+                write_atomic(tracking_file, '\n'.join(lines))
+                return True
+    
     print(f"\n请手动更新迁移跟踪表:")
     print(f"文件: {file_name}")
     print(f"常量类: {constant_class}")
     print(f"状态: {status}")
     print(f"日期: {date}")
     print(f"跟踪表路径: {tracking_file}")
+    return False
+
+def uses_screenutil(content):
+    """
+    判断去掉注释、字符串和 flutter_screenutil 导入后的源码是否仍使用ScreenUtil
+    """
+    pieces = []
+    pos = 0
+    for start, end in literal_spans(content):
+        pieces.append(content[pos:start])
+        pos = end
+    pieces.append(content[pos:])
+    code = ' '.join(pieces)
+    return SCREENUTIL_USAGE.search(code.replace(SCREENUTIL_IMPORT, '')) is not None
+
+def rewrite_content(content, calls, constant_class):
+    """
+    按扫描得到的位置一次性替换所有数值参数调用为常量引用，并维护导入语句。
+    返回 (新源码, 被替换的 (类型, 数值) 列表)
+    """
+    pieces = []
+    replaced = []
+    pos = 0
+    for call in sorted(calls, key=lambda c: c['start']):
+        if call['value'] is None:
+            continue
+        pieces.append(content[pos:call['start']])
+        pieces.append(f"{constant_class}.{constant_name(call['type'], call['value'])}")
+        replaced.append((call['type'], call['value']))
+        pos = call['end']
+    if not replaced:
+        return content, replaced
+    pieces.append(content[pos:])
+    content = ''.join(pieces)
+    
+    # 添加常量类导入（已通过相对路径导入时跳过）
+    if not re.search(r"page_layout_constants\.dart['\"]", content):
+        imports = list(re.finditer(r'^import [^\n]*;[ \t]*$', content, re.M))
+        at = imports[-1].end() + 1 if imports else 0
+        content = content[:at] + CONSTANTS_IMPORT + '\n' + content[at:]
+    
+    # 不再使用ScreenUtil时移除其导入
+    if SCREENUTIL_IMPORT in content and not uses_screenutil(content):
+        content = content.replace(SCREENUTIL_IMPORT + '\n', '', 1)
+    return content, replaced
+
+def parse_constant_name(name):
+    """
+    从常量名解析 (类型, 数值)，如 fontSize_12_5 -> ('sp', 12.5)
+    """
+    prefix, _, rest = name.partition('_')
+    param_type = {v: k for k, v in CONSTANT_PREFIXES.items()}[prefix]
+    value = float(rest.lstrip('m').replace('_', '.'))
+    return param_type, -value if rest.startswith('m') else value
+
+def constant_getter(param_type, value):
+    """
+    生成引用 BaseLayoutConstants 共享常量的 getter，页面类不再单独初始化和存储该值
+    """
+    name = constant_name(param_type, value)
+    return f"static double get {name} => BaseLayoutConstants.{name};"
+
+def sort_constants(items):
+    """
+    按类型（宽、高、字号）和数值排序，保证生成代码顺序稳定
+    """
+    type_order = list(SCREENUTIL_SETTERS)
+    return sorted(items, key=lambda x: (type_order.index(x[0]), x[1]))
+
+def find_constant_class(source, constant_class):
+    """
+    返回常量类类体的 (起始偏移, 结束偏移)，类不存在时返回 None
+    """
+    header = re.search(rf'^class {constant_class}\b[^{{]*\{{', source, re.M)
+    if header is None:
+        return None
+    return header.end(), re.compile(r'^\}', re.M).search(source, header.end()).start()
+
+def generated_constants(source, constant_class):
+    """
+    读取常量类自动迁移区块中的常量，返回 {(类型, 数值): 'final' 或 'getter'}
+    """
+    span = find_constant_class(source, constant_class)
+    if span is None:
+        return {}
+    body = source[span[0]:span[1]]
+    if GENERATED_HEADER not in body:
+        return {}
+    found = {}
+    for final_name, getter_name in GENERATED_CONSTANT.findall(body, body.index(GENERATED_HEADER)):
+        found[parse_constant_name(final_name or getter_name)] = 'final' if final_name else 'getter'
+    return found
+
+def update_constant_class(source, constant_class, needed, file_name=None, shared=None):
+    """
+    在常量类中补充所需的常量定义。
+    自动生成的常量集中在类末尾的固定区块中（区块外手写的同名常量保持不变），
+    按类型和数值排序，重复执行结果不变；
+    shared 中的常量生成为引用 BaseLayoutConstants 的 getter，为 None 时沿用区块中已有的形式；
+    常量类不存在时在文件末尾新建。
+    """
+    existing = generated_constants(source, constant_class)
+    if shared is None:
+        shared = {x for x, kind in existing.items() if kind == 'getter'}
+    
+    def block_lines(items):
+        return ''.join(f"  {constant_getter(*x) if x in shared else constant_definition(*x)}\n"
+                       for x in sort_constants(items))
+    
+    span = find_constant_class(source, constant_class)
+    if span is None:
+        if not needed:
+            return source
+        return (source.rstrip('\n') + f"\n\n/// {file_name or constant_class} 专用布局常量类\n"
+                f"class {constant_class} extends BaseLayoutConstants {{\n" + GENERATED_HEADER
+                + block_lines(needed) + "}\n")
+    start, end = span
+    body = source[start:end]
+    core = body[:body.index(GENERATED_HEADER)].rstrip() if GENERATED_HEADER in body else body.rstrip()
+    # 类中已手写同名常量的不再生成
+    wanted = {x for x in set(existing) | set(needed) if not re.search(rf'\b{constant_name(*x)}\b', core)}
+    block = ''
+    if wanted:
+        block = ('\n' if core else '') + '\n' + GENERATED_HEADER + block_lines(wanted)
+    return source[:start] + core + (block or '\n') + source[end:]
+
+def collect_page_constants(constants_source, analyses=()):
+    """
+    汇总各页面常量类需要的 (类型, 数值)：来自分析结果中的数值参数调用，
+    以及常量类中已有的自动迁移区块
+    """
+    wanted = {}
+    for constant_class in sorted(set(PAGE_TO_CONSTANT_CLASS.values())):
+        found = set(generated_constants(constants_source, constant_class))
+        if found:
+            wanted[constant_class] = found
+    for analysis in analyses:
+        constant_class = analysis['constant_class']
+        if constant_class == 'BaseLayoutConstants':
+            continue
+        for param_type, values in analysis['unique_values'].items():
+            wanted.setdefault(constant_class, set()).update((param_type, v) for v in values)
+    return wanted
+
+def intern_constants(wanted, min_classes=2):
+    """
+    找出被至少 min_classes 个页面常量类使用的 (类型, 数值)，驻留到 BaseLayoutConstants。
+    返回 (共享集合, 每个常量被引用的类数)
+    """
+    usage = {}
+    for items in wanted.values():
+        for x in items:
+            usage[x] = usage.get(x, 0) + 1
+    return {x for x, n in usage.items() if n >= min_classes}, usage
+
+def print_intern_report(wanted, shared, usage, top=10):
+    """
+    输出驻留报告：启动时节省的 ScreenUtil 初始化次数和存储的 double 数量
+    """
+    before = sum(len(items) for items in wanted.values())
+    getters = sum(len(items & shared) for items in wanted.values())
+    after = len(shared) + before - getters
+    print("\n=== 常量驻留报告 ===")
+    print(f"页面常量类: {len(wanted)} 个")
+    print(f"驻留前: {before} 个 static final 初始化（{before} 个 double）")
+    print(f"驻留后: BaseLayoutConstants 共享 {len(shared)} 个 + 页面独有 {before - getters} 个 = {after} 个，"
+          f"页面类改为 {getters} 个 getter")
+    print(f"启动时节省: {before - after} 次 ScreenUtil 初始化和 {before - after} 个 double 存储")
+    ranked = sorted(shared, key=lambda x: (-usage[x], list(SCREENUTIL_SETTERS).index(x[0]), x[1]))[:top]
+    if ranked:
+        print("复用最多的共享常量:")
+        for x in ranked:
+            print(f"  {constant_name(*x)}: {usage[x]} 个类")
+    return {'before': before, 'after': after, 'shared': len(shared), 'getters': getters}
+
+def write_atomic(file_path, content):
+    """
+    先写入同目录临时文件再替换，避免中断时留下半写文件
+    """
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    try:
+        os.chmod(tmp, os.stat(file_path).st_mode & 0o7777)
+    except OSError:
+        pass
+    os.replace(tmp, file_path)
+
+def apply_migration(root, dart_files, dry_run=False, intern=False):
+    """
+    批量迁移：每个文件单遍替换所有数值参数调用，补充常量类定义并维护导入。
+    intern 为 True 时把多个页面共用的常量驻留到 BaseLayoutConstants，页面类改为 getter；
+    dry_run 时只输出统一diff，不写入文件
+    """
+    constants_path = os.path.join(root, CONSTANTS_FILE)
+    changes = {}
+    needed = {}
+    class_files = {}
+    counts = {}
+    for file_path in dart_files:
+        file_name = os.path.basename(file_path)
+        constant_class = PAGE_TO_CONSTANT_CLASS.get(file_name)
+        if constant_class is None or os.path.abspath(file_path) == os.path.abspath(constants_path):
+            continue
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            original = f.read()
+        content, replaced = rewrite_content(original, scan_content(original), constant_class)
+        if not replaced:
+            continue
+        changes[file_path] = (original, content)
+        needed.setdefault(constant_class, set()).update(replaced)
+        class_files[constant_class] = file_name
+        counts[file_path] = len(replaced)
+    
+    if needed or intern:
+        with open(constants_path, 'r', encoding='utf-8', newline='') as f:
+            original = f.read()
+        content = original
+        shared = None
+        if intern:
+            wanted = collect_page_constants(original)
+            for constant_class, items in needed.items():
+                wanted.setdefault(constant_class, set()).update(items)
+            shared, usage = intern_constants(wanted)
+            content = update_constant_class(content, 'BaseLayoutConstants', shared, shared=set())
+            needed = wanted
+            print_intern_report(wanted, shared, usage)
+        for constant_class in sorted(needed):
+            content = update_constant_class(content, constant_class, needed[constant_class],
+                                            class_files.get(constant_class), shared=shared)
+        if content != original:
+            changes[constants_path] = (original, content)
+    
+    for file_path in sorted(changes):
+        original, content = changes[file_path]
+        rel = os.path.relpath(file_path, root)
+        if dry_run:
+            sys.stdout.writelines(difflib.unified_diff(
+                original.splitlines(True), content.splitlines(True), f"a/{rel}", f"b/{rel}"))
+        else:
+            write_atomic(file_path, content)
+            print(f"已更新: {rel}")
+    
+    if not dry_run:
+        for file_path, count in sorted(counts.items()):
+            update_tracking_table(file_path, "进行中", root, note=f"自动替换{count}处调用，待验证布局", write=True)
+    print(f"\n{'预览' if dry_run else '完成'}迁移: 替换 {sum(counts.values())} 处调用, "
+          f"涉及 {len(counts)} 个文件, 修改 {len(changes)} 个文件")
+    return counts
 
 def main():
     """
     主函数
     """
+    parser = argparse.ArgumentParser(description="分析Flutter文件中的ScreenUtil调用，生成迁移建议和日志")
+    parser.add_argument('file', nargs='?', help="只分析单个Dart文件")
+    parser.add_argument('--root', default=DEFAULT_PROJECT_ROOT, help="项目根目录，日志和跟踪表均相对该目录")
+    parser.add_argument('--all', action='store_true', help="分析全部Dart文件，而不仅是 PAGE_TO_CONSTANT_CLASS 中的页面")
+    parser.add_argument('--workers', type=int, default=None, help="并行分析的进程数，默认等于CPU核数")
+    parser.add_argument('--no-cache', action='store_true', help="忽略并不写入扫描缓存")
+    parser.add_argument('--apply', action='store_true', help="自动将数值参数调用替换为常量类引用")
+    parser.add_argument('--dry-run', action='store_true', help="与 --apply 一起使用，只输出统一diff")
+    parser.add_argument('--frames', action='store_true',
+                        help="按 build/itemBuilder/动画回调中的调用估算每帧开销并排序")
+    parser.add_argument('--intern', action='store_true',
+                        help="把多个页面共用的常量驻留到 BaseLayoutConstants，并输出节省报告")
+    parser.add_argument('--bench', nargs='?', const='', default=None, metavar='DIR',
+                        help="对比旧版与单遍扫描的性能，默认目录为 <root>/lib")
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    
     print("=== 布局参数迁移辅助工具 ===")
     print("用途: 分析Flutter文件中的ScreenUtil调用，生成迁移建议和日志")
     print("\n")
     
-    if len(sys.argv) > 1:
+    if args.dry_run and not args.apply:
+        parser.error("--dry-run 需要与 --apply 一起使用")
+    
+    if args.bench is not None:
+        # 扫描性能基准
+        benchmark(args.bench or os.path.join(root, 'lib'))
+    elif args.apply:
+        # 批量迁移：指定文件或 PAGE_TO_CONSTANT_CLASS 中的全部页面
+        dart_files = [args.file] if args.file else find_dart_files(root, only_pages=True)
+        apply_migration(root, dart_files, dry_run=args.dry_run, intern=args.intern)
+    elif args.file:
         # 处理单个文件
-        file_path = sys.argv[1]
+        file_path = args.file
         if os.path.exists(file_path) and file_path.endswith('.dart'):
             print(f"分析文件: {file_path}")
             analysis = analyze_file(file_path)
@@ -304,6 +1202,9 @@ def main():
                 print(f"发现 {analysis['total_calls']} 处ScreenUtil调用")
                 print(f"常量类: {analysis['constant_class']}")
                 
+                if args.frames:
+                    print_frame_report(rank_frame_cost([analysis]), top_scopes=None)
+                
                 # 打印迁移建议
                 print("\n迁移建议:")
                 print(generate_migration_suggestions(analysis))
@@ -313,47 +1214,39 @@ def main():
                 print(generate_constant_definitions(analysis))
                 
                 # 创建迁移日志
-                log_file = create_migration_log(analysis)
+                log_file = create_migration_log(analysis, root)
                 
                 # 更新跟踪表
-                update_tracking_table(file_path)
+                update_tracking_table(file_path, root=root)
         else:
             print(f"错误：文件不存在或不是Dart文件: {file_path}")
     else:
         # 扫描目录中的所有Dart文件
-        project_root = '/Users/bytedance/traeProjects/Contrail'
-        print(f"扫描项目目录: {project_root}")
-        
-        dart_files = []
-        for root, dirs, files in os.walk(project_root):
-            # 跳过测试目录和构建目录
-            if 'test' in dirs:
-                dirs.remove('test')
-            if 'build' in dirs:
-                dirs.remove('build')
-                
-            for file in files:
-                if file.endswith('.dart') and file in PAGE_TO_CONSTANT_CLASS:
-                    dart_files.append(os.path.join(root, file))
-        
+        print(f"扫描项目目录: {root}")
+        started = time.perf_counter()
+        dart_files = find_dart_files(root, only_pages=not args.all)
         print(f"找到 {len(dart_files)} 个需要分析的文件")
         
+        cache_path = None if args.no_cache else os.path.join(root, CACHE_FILE)
+        analyses, changed = scan_project(root, dart_files, cache_path=cache_path, workers=args.workers)
+        changed = set(changed)
+        print(f"重新分析 {len(changed)} 个文件，缓存命中 {len(analyses) - len(changed)} 个文件")
+        
         # 统计汇总
         summary = []
-        for file_path in dart_files:
-            print(f"分析: {file_path}")
-            analysis = analyze_file(file_path)
-            if analysis:
-                summary.append({
-                    'file': analysis['file_name'],
-                    'calls': analysis['total_calls'],
-                    'width': len(analysis['unique_values']['width']),
-                    'height': len(analysis['unique_values']['height']),
-                    'sp': len(analysis['unique_values']['sp'])
-                })
-                
-                # 创建迁移日志
-                create_migration_log(analysis)
+        for analysis in analyses:
+            summary.append({
+                'file': analysis['file_name'],
+                'calls': analysis['total_calls'],
+                'width': len(analysis['unique_values']['width']),
+                'height': len(analysis['unique_values']['height']),
+                'sp': len(analysis['unique_values']['sp'])
+            })
+            
+            # 只为发生变化（或日志缺失）的文件重新生成迁移日志
+            log_file = os.path.join(root, LOG_DIR, f"{os.path.splitext(analysis['file_name'])[0]}迁移日志.md")
+            if analysis['file_path'] in changed or not os.path.exists(log_file):
+                create_migration_log(analysis, root)
         
         # 打印汇总信息
         print("\n=== 分析汇总 ===")
@@ -364,7 +1257,15 @@ def main():
         for s in sorted(summary, key=lambda x: x['calls'], reverse=True):
             print(f"{s['file']}: {s['calls']}次调用 (width:{s['width']}, height:{s['height']}, sp:{s['sp']})")
         
-        print("\n所有文件的迁移日志已创建在 docs/迁移日志/ 目录下")
+        if args.frames:
+            print_frame_report(rank_frame_cost(analyses))
+        
+        if args.intern:
+            with open(os.path.join(root, CONSTANTS_FILE), 'r', encoding='utf-8') as f:
+                wanted = collect_page_constants(f.read(), analyses)
+            print_intern_report(wanted, *intern_constants(wanted))
+        
+        print(f"\n所有文件的迁移日志已创建在 {LOG_DIR}/ 目录下（耗时 {time.perf_counter() - started:.2f} 秒）")
         print("请根据日志进行迁移工作，并更新迁移跟踪表")
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import sys
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import backup_stats as bs
+
+def habit(hid, cycle, target, days):
+    return {"id": hid, "name": hid, "trackTime": False, "cycleType": cycle, "goalType": 0, "targetDays": target,
+            "colorValue": 1, "trackingDurations": {},
+            "dailyCompletionStatus": {f"{d}T00:00:00.000": True for d in days}}
+
+@unittest.skipIf(bs.np is None, "numpy not installed")
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.backup = bs.Backup([
+            habit("no-goal", None, 5, ["2024-06-10", "2024-06-11"]),
+            habit("daily", 0, None, ["2024-06-10"]),
+        ])
+
+    def test_null_cycle_type_matches_no_branch(self):
+        for cycle, start, end in bs.report_periods(date(2024, 6, 12), 2024, 6).values():
+            doc = bs.report(self.backup, cycle, start, end)
+            self.assertEqual(doc["detailedCompletion"]["no-goal"],
+                             {"habitName": "no-goal", "totalRequiredDays": 0, "completedDays": 0,
+                              "completionRate": 0.0, "isCompleted": False})
+            self.assertEqual(doc["goalCompletion"][0]["requiredDays"], 0)
+            self.assertNotIn("no-goal", doc["topHabits"])
+            self.assertEqual(sum(v["habits"] for v in doc["byCycleType"].values()), 1)
+            self.assertEqual(doc["totalHabits"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
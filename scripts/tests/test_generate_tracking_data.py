@@ -0,0 +1,105 @@
+import json
+import random
+import sys
+import tempfile
+import unittest
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import generate_tracking_data as g
+
+DEVICE_BACKUP = {
+    "habits": [
+        {
+            "id": "timed",
+            "name": "Reading",
+            "trackTime": True,
+            "trackingDurations": {
+                "2024-03-04T08:00:00.000": [1800000, 3600000],
+                "2024-03-05T09:30:00.000": [2400000, 600000, 600000],
+                "2024-04-01T07:00:00.000": [],
+            },
+            "dailyCompletionStatus": {
+                "2024-03-04T00:00:00.000": True,
+                "2024-03-05T00:00:00.000": False,
+            },
+        },
+        {
+            "id": "checkin",
+            "name": "Stretch",
+            "trackTime": False,
+            "trackingDurations": {},
+            "dailyCompletionStatus": {
+                "2024-03-01T00:00:00.000": True,
+                "2024-03-02T00:00:00.000": False,
+                "2024-03-03T00:00:00.000": True,
+                "2024-04-01T00:00:00.000": False,
+            },
+        },
+    ],
+    "settings": {},
+}
+
+EXPECTED = {
+    "timed": {"2024-03": {"count": 5, "duration_ms": 9000000}},
+    "checkin": {"2024-03": {"count": 2}},
+}
+
+class ExtractTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.backup = Path(tmp.name) / "contrail_backup_1.json"
+        self.backup.write_text(json.dumps(DEVICE_BACKUP, indent=4), encoding="utf-8")
+
+    def sums(self, threshold):
+        return {h["id"]: h["sums"] for h in g.backup_summaries(self.backup, stream_threshold_bytes=threshold)}
+
+    def test_summaries_count_every_duration_and_true_completions(self):
+        self.assertEqual(self.sums(64 << 20), EXPECTED)
+
+    def test_streamed_summaries_match_loaded(self):
+        self.assertEqual(self.sums(0), EXPECTED)
+
+    def test_extract_aggregates(self):
+        agg = g.extract_aggregates(self.backup)
+        self.assertEqual({h["id"]: h["months"] for h in agg["habits"]}, EXPECTED)
+
+class AllocateExactTest(unittest.TestCase):
+    def check(self, count, days, weekday_cap, weekend_cap, m, **kw):
+        alloc = g.allocate_exact(count, days, weekday_cap, weekend_cap, min_weekend_per_day=m, **kw)
+        self.assertEqual(sum(alloc.values()), count)
+        for d, n in alloc.items():
+            self.assertLessEqual(n, kw.get("weekend_cap_max", weekend_cap) if g.is_weekend(d) else weekday_cap)
+        return alloc
+
+    def test_weekend_total_reachable_with_minimum_per_day(self):
+        alloc = self.check(43, g.month_days(2026, 8), 1, 3, 3, rng=random.Random(1))
+        self.assertTrue(all(n in (0, 3) for d, n in alloc.items() if g.is_weekend(d)))
+
+    def test_weekend_total_reachable_with_random_caps(self):
+        for seed in (10, 20, 24, 33, 40):
+            self.check(8, g.month_days(2024, 2), 0, 4, 3, weekend_cap_min=1, weekend_cap_max=3,
+                       rng=random.Random(seed))
+
+    def test_infeasible_still_raises(self):
+        with self.assertRaises(g.AllocationInfeasible):
+            g.allocate_exact(200, g.month_days(2024, 2), 1, 3, rng=random.Random(1))
+
+@unittest.skipIf(g.np is None, "numpy not installed")
+class MonthColumnsTest(unittest.TestCase):
+    def test_numpy_columns_format_like_python(self):
+        times = [g.epoch_ms(datetime(2024, 3, d, h, m, s, ms * 1000))
+                 for d, h, m, s, ms in ((1, 0, 0, 0, 0), (9, 13, 5, 59, 7), (31, 23, 59, 59, 999))]
+        durations = [1, 60000, 4140000]
+        py = g.MonthColumns(0, array("q", times), array("q", durations))
+        vec = g.MonthColumns(0, g.np.array(times, dtype=g.np.int64), g.np.array(durations, dtype=g.np.int64))
+        self.assertEqual(list(vec.td().items()), list(py.td().items()))
+        self.assertEqual(vec.duration_ms(), py.duration_ms())
+        self.assertEqual(vec.to_json(), py.to_json())
+
+if __name__ == "__main__":
+    unittest.main()
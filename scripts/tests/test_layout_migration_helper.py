@@ -0,0 +1,41 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import layout_migration_helper as lm
+
+SOURCE = """import 'package:flutter/material.dart';
+import 'package:flutter_screenutil/flutter_screenutil.dart';
+
+class A {
+  // 8.w
+  Widget build(BuildContext context) => Text('gap ${16.w} / ${ScreenUtil().setSp(12)} 4.h',
+      style: TextStyle(fontSize: 14.sp, height: r'${2.h}'.length.h));
+}
+"""
+
+class ScanTest(unittest.TestCase):
+    def test_interpolation_is_scanned_and_literals_are_skipped(self):
+        calls = lm.scan_content(SOURCE)
+        self.assertEqual([c['text'] for c in calls], ['16.w', 'ScreenUtil().setSp(12)', '14.sp'])
+        self.assertEqual([(c['line'], c['column']) for c in calls], [(6, 53), (6, 63), (7, 34)])
+
+    def test_nested_strings_in_interpolation(self):
+        calls = lm.scan_content("""Text("${'${12.w}'}" '''${ {1: 2}[1] } ${3.h}''' '\\${9.w}' '\\\\${10.sp}')""")
+        self.assertEqual([c['text'] for c in calls], ['12.w', '3.h', '10.sp'])
+
+    def test_rewrite_inside_interpolation(self):
+        out, replaced = lm.rewrite_content(SOURCE, lm.scan_content(SOURCE), 'AConstants')
+        self.assertIn("'gap ${AConstants.width_16} / ${AConstants.fontSize_12} 4.h'", out)
+        self.assertEqual(replaced, [('width', 16.0), ('sp', 12.0), ('sp', 14.0)])
+        # 原始字符串后的 .length.h 仍在使用 ScreenUtil
+        self.assertIn(lm.SCREENUTIL_IMPORT, out)
+
+    def test_uses_screenutil_inside_interpolation(self):
+        self.assertTrue(lm.uses_screenutil("var a = '${gap.w}';"))
+        self.assertFalse(lm.uses_screenutil("var a = '${gap}'; // 3.w"))
+
+if __name__ == "__main__":
+    unittest.main()
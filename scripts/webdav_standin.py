@@ -0,0 +1,482 @@
+import argparse
+import base64
+import email.utils
+import http.client
+import io
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+CHUNK = 64 * 1024
+FAULT_KINDS = ("status", "drop", "stall")
+PROPFIND_BODY = (b'<?xml version="1.0" encoding="utf-8"?>\n<d:propfind xmlns:d="DAV:"><d:prop>'
+                 b'<d:getlastmodified/><d:creationdate/><d:getcontentlength/></d:prop></d:propfind>')
+HREF = re.compile(r"<(?:\w+:)?href>([^<]*)</(?:\w+:)?href>")
+BACKUP_NAME = re.compile(r"contrail_backup_\d+\.json$")
+
+class Throttle:
+    def __init__(self, bytes_per_s):
+        self.rate = bytes_per_s
+        self.start = time.perf_counter()
+        self.sent = 0
+
+    def wait(self, n):
+        self.sent += n
+        if self.rate:
+            ahead = self.sent / self.rate - (time.perf_counter() - self.start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+def chunk_size(bytes_per_s):
+    return max(1024, min(CHUNK, int(bytes_per_s // 20))) if bytes_per_s else CHUNK
+
+class Standin(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, root, latency_ms=0, jitter_ms=0, bandwidth_kbps=0, fail_rate=0.0,
+                 fail_methods=None, fault_kind="status", fail_status=503, stall_s=30.0, user=None,
+                 password=None, fault_seed=None, log=None):
+        super().__init__(addr, Handler)
+        self.root = Path(root).resolve()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bytes_per_s = bandwidth_kbps * 1024 / 8 if bandwidth_kbps else 0
+        self.fail_rate = fail_rate
+        self.fail_methods = {m.upper() for m in fail_methods} if fail_methods else None
+        self.fault_kind = fault_kind
+        self.fail_status = fail_status
+        self.stall_s = stall_s
+        self.auth = "Basic " + base64.b64encode(f"{user}:{password or ''}".encode()).decode() if user else None
+        self.rng = random.Random(fault_seed)
+        self.lock = threading.Lock()
+        self.log = log
+        self.records = []
+
+    def delay(self):
+        with self.lock:
+            jitter = self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        if self.latency_ms or jitter:
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+    def fault(self, method):
+        if not self.fail_rate or (self.fail_methods and method not in self.fail_methods):
+            return None
+        with self.lock:
+            return self.fault_kind if self.rng.random() < self.fail_rate else None
+
+    def record(self, rec):
+        line = json.dumps(rec, ensure_ascii=False)
+        with self.lock:
+            self.records.append(rec)
+            if self.log is not None:
+                self.log.write(line + "\n")
+                self.log.flush()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "ContrailWebDAVStandin/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def local_path(self):
+        parts = [p for p in unquote(urlsplit(self.path).path).split("/") if p]
+        if any(p in (".", "..") for p in parts):
+            return None
+        return self.server.root.joinpath(*parts)
+
+    def href(self, p):
+        rel = p.relative_to(self.server.root).as_posix()
+        h = "/" + quote(rel) if rel != "." else "/"
+        return h + "/" if p.is_dir() and not h.endswith("/") else h
+
+    def read_body(self, sink=None):
+        throttle = Throttle(self.server.bytes_per_s)
+        size = chunk_size(self.server.bytes_per_s)
+        total = 0
+
+        def take(n):
+            nonlocal total
+            while n > 0:
+                data = self.rfile.read(min(size, n))
+                if not data:
+                    raise ConnectionError("client closed during upload")
+                n -= len(data)
+                total += len(data)
+                if sink is not None:
+                    sink.write(data)
+                throttle.wait(len(data))
+
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            while True:
+                n = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if n == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                take(n)
+                self.rfile.readline()
+        else:
+            take(int(self.headers.get("Content-Length") or 0))
+        self.bytes_in = total
+        return total
+
+    def drop(self):
+        self.close_connection = True
+        self.status = 499
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+    def send(self, status, body=b"", ctype=None, headers=()):
+        if self.fault_kind == "drop" and (not body or self.command == "HEAD"):
+            return self.drop()
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        if ctype:
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.write_body(io.BytesIO(body), len(body), drop=self.fault_kind == "drop")
+
+    def write_body(self, src, length, drop=False):
+        throttle = Throttle(self.server.bytes_per_s)
+        size = chunk_size(self.server.bytes_per_s)
+        left = length // 2 if drop else length
+        while left > 0:
+            chunk = src.read(min(size, left))
+            if not chunk:
+                raise ConnectionError("source shorter than Content-Length")
+            self.wfile.write(chunk)
+            self.bytes_out += len(chunk)
+            left -= len(chunk)
+            throttle.wait(len(chunk))
+        if drop:
+            self.wfile.flush()
+            self.drop()
+
+    def handle_one_request(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.status = None
+        self.fault_kind = None
+        self.started = time.perf_counter()
+        super().handle_one_request()
+        if self.status is not None:
+            elapsed = time.perf_counter() - self.started
+            moved = self.bytes_in + self.bytes_out
+            self.server.record({
+                "ts": round(time.time(), 3), "method": self.command, "path": unquote(urlsplit(self.path).path),
+                "status": self.status, "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "latency_ms": round(elapsed * 1000, 3),
+                "throughput_kbps": round(moved * 8 / 1024 / elapsed, 1) if elapsed > 0 and moved else 0.0,
+                "fault": self.fault_kind,
+            })
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def dispatch(self, fn):
+        try:
+            if self.server.auth and self.headers.get("Authorization") != self.server.auth:
+                self.read_body()
+                return self.send(401, headers=[("WWW-Authenticate", 'Basic realm="contrail"')])
+            self.server.delay()
+            self.fault_kind = self.server.fault(self.command)
+            if self.fault_kind == "status":
+                self.read_body()
+                return self.send(self.server.fail_status)
+            if self.fault_kind == "stall":
+                time.sleep(self.server.stall_s)
+            p = self.local_path()
+            if p is None:
+                self.read_body()
+                return self.send(403)
+            fn(p)
+        except (ConnectionError, OSError):
+            self.close_connection = True
+            if self.status is None:
+                self.status = 499
+
+    def do_OPTIONS(self):
+        self.dispatch(lambda p: self.send(200, headers=[
+            ("DAV", "1"), ("Allow", "OPTIONS, PROPFIND, GET, HEAD, PUT, DELETE, MKCOL")]))
+
+    def do_GET(self):
+        self.dispatch(self.get)
+
+    def do_HEAD(self):
+        self.dispatch(self.get)
+
+    def get(self, p):
+        if not p.is_file():
+            return self.send(404)
+        with open(p, "rb") as f:
+            st = os.fstat(f.fileno())
+            if self.fault_kind == "drop" and (not st.st_size or self.command == "HEAD"):
+                return self.drop()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json" if p.suffix == ".json" else "application/octet-stream")
+            self.send_header("Content-Length", str(st.st_size))
+            self.send_header("Last-Modified", email.utils.formatdate(st.st_mtime, usegmt=True))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.write_body(f, st.st_size, drop=self.fault_kind == "drop")
+
+    def do_PUT(self):
+        self.dispatch(self.put)
+
+    def put(self, p):
+        if not p.parent.is_dir():
+            self.read_body()
+            return self.send(409)
+        if p.is_dir():
+            self.read_body()
+            return self.send(405)
+        existed = p.exists()
+        fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=".put-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self.read_body(sink=f)
+            if self.fault_kind == "drop":
+                os.unlink(tmp)
+                return self.drop()
+            os.replace(tmp, p)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.send(204 if existed else 201)
+
+    def do_DELETE(self):
+        self.dispatch(self.delete)
+
+    def delete(self, p):
+        if p == self.server.root:
+            return self.send(403)
+        if p.is_dir():
+            shutil.rmtree(p)
+        elif p.exists():
+            p.unlink()
+        else:
+            return self.send(404)
+        self.send(204)
+
+    def do_MKCOL(self):
+        self.dispatch(self.mkcol)
+
+    def mkcol(self, p):
+        if self.read_body():
+            return self.send(415)
+        if p.exists():
+            return self.send(405)
+        if not p.parent.is_dir():
+            return self.send(409)
+        p.mkdir()
+        self.send(201)
+
+    def do_PROPFIND(self):
+        self.dispatch(self.propfind)
+
+    def propfind(self, p):
+        self.read_body()
+        if not p.exists():
+            return self.send(404)
+        depth = self.headers.get("Depth", "1")
+        entries = [p]
+        if p.is_dir() and depth != "0":
+            entries.extend(sorted(p.iterdir()))
+        out = ['<?xml version="1.0" encoding="utf-8"?>\n<d:multistatus xmlns:d="DAV:">']
+        for e in entries:
+            if e.name.startswith(".put-"):
+                continue
+            st = e.stat()
+            if e.is_dir():
+                props = "<d:resourcetype><d:collection/></d:resourcetype>"
+            else:
+                props = f"<d:resourcetype/><d:getcontentlength>{st.st_size}</d:getcontentlength>"
+            created = datetime.fromtimestamp(st.st_ctime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            out.append(
+                f"<d:response><d:href>{escape(self.href(e))}</d:href><d:propstat><d:prop>"
+                f"<d:getlastmodified>{email.utils.formatdate(st.st_mtime, usegmt=True)}</d:getlastmodified>"
+                f"<d:creationdate>{created}</d:creationdate>{props}"
+                f"</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>")
+        out.append("</d:multistatus>")
+        self.send(207, "\n".join(out).encode("utf-8"), 'application/xml; charset="utf-8"')
+
+def backup_sources(inputs):
+    found = []
+    for s in inputs:
+        p = Path(s)
+        if p.is_dir():
+            found.extend(sorted(p.glob("contrail_backup_*.json")))
+        elif p.is_file():
+            found.append(p)
+    return found
+
+def seed_root(root, base, inputs, copies=1):
+    target = Path(root).joinpath(*[p for p in base.split("/") if p])
+    target.mkdir(parents=True, exist_ok=True)
+    sources = backup_sources(inputs)
+    ts = int(time.time() * 1000)
+    n = 0
+    for src in sources:
+        for i in range(copies):
+            name = src.name if i == 0 else f"contrail_backup_{ts - n}.json"
+            dst = target / name
+            if dst.exists():
+                dst = target / f"contrail_backup_{ts - n}.json"
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copyfile(src, dst)
+            n += 1
+    return target, n
+
+def summarize(records):
+    out = {}
+    for r in records:
+        out.setdefault(r["method"], []).append(r)
+    summary = {}
+    for method, rs in sorted(out.items()):
+        lat = sorted(r["latency_ms"] for r in rs)
+        moved = sum(r["bytes_in"] + r["bytes_out"] for r in rs)
+        secs = sum(r["latency_ms"] for r in rs) / 1000
+        summary[method] = {
+            "requests": len(rs),
+            "errors": sum(1 for r in rs if r["status"] >= 400),
+            "faults": sum(1 for r in rs if r["fault"]),
+            "bytes": moved,
+            "latency_p50_ms": round(statistics.median(lat), 3),
+            "latency_p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3),
+            "throughput_kbps": round(moved * 8 / 1024 / secs, 1) if secs > 0 else 0.0,
+        }
+    return summary
+
+def client_request(conn, method, path, body=None, headers=None):
+    t = time.perf_counter()
+    try:
+        conn.request(method, quote(path), body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        status = resp.status
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        data, status = b"", None
+    return status, data, time.perf_counter() - t
+
+def run_bench(host, port, base, payloads, rounds, user=None, password=None):
+    auth = {"Authorization": "Basic " + base64.b64encode(f"{user}:{password or ''}".encode()).decode()} if user else {}
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    base = "/" + "/".join(p for p in base.split("/") if p)
+    stages = {"mkcol": [], "upload": [], "list": [], "restore": []}
+    failures = {k: 0 for k in stages}
+    ts = int(time.time() * 1000)
+    for r in range(rounds):
+        for i, body in enumerate(payloads):
+            status, _, dt = client_request(conn, "MKCOL", base, headers=auth)
+            stages["mkcol"].append((dt, 0))
+            failures["mkcol"] += status not in (201, 405)
+            name = f"contrail_backup_{ts + r * len(payloads) + i}.json"
+            status, _, dt = client_request(conn, "PUT", f"{base}/{name}", body,
+                                           dict(auth, **{"Content-Type": "application/json"}))
+            stages["upload"].append((dt, len(body)))
+            failures["upload"] += status not in (200, 201, 204)
+        status, data, dt = client_request(conn, "PROPFIND", base, PROPFIND_BODY,
+                                          dict(auth, Depth="1", **{"Content-Type": "text/xml"}))
+        stages["list"].append((dt, len(data)))
+        failures["list"] += status != 207
+        hrefs = sorted(h for h in HREF.findall(data.decode("utf-8", "replace")) if BACKUP_NAME.search(h))
+        if hrefs:
+            status, data, dt = client_request(conn, "GET", unquote(hrefs[-1]), headers=auth)
+            stages["restore"].append((dt, len(data)))
+            failures["restore"] += status != 200
+    conn.close()
+    for stage, samples in stages.items():
+        if not samples:
+            continue
+        secs = [dt for dt, _ in samples]
+        moved = sum(n for _, n in samples)
+        print(f"BENCH {stage:<8} n={len(samples):<5} p50={statistics.median(secs) * 1000:9.2f} ms "
+              f"max={max(secs) * 1000:9.2f} ms {moved * 8 / 1024 / sum(secs) if sum(secs) else 0:10.1f} kbps "
+              f"failures={failures[stage]}")
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--root", default=None)
+    p.add_argument("--base", default="Contrail")
+    p.add_argument("--seed_from", nargs="*", default=[])
+    p.add_argument("--seed_copies", type=int, default=1)
+    p.add_argument("--user", default=None)
+    p.add_argument("--password", default=None)
+    p.add_argument("--latency_ms", type=float, default=0.0)
+    p.add_argument("--jitter_ms", type=float, default=0.0)
+    p.add_argument("--bandwidth_kbps", type=float, default=0.0)
+    p.add_argument("--fail_rate", type=float, default=0.0)
+    p.add_argument("--fail_methods", nargs="*", default=None)
+    p.add_argument("--fault_kind", choices=FAULT_KINDS, default="status")
+    p.add_argument("--fail_status", type=int, default=503)
+    p.add_argument("--stall_s", type=float, default=30.0)
+    p.add_argument("--fault_seed", type=int, default=None)
+    p.add_argument("--log", default=None)
+    p.add_argument("--duration", type=float, default=None)
+    p.add_argument("--bench_rounds", type=int, default=0)
+    args = p.parse_args()
+    tmp = None
+    root = args.root
+    if root is None:
+        tmp = tempfile.TemporaryDirectory(prefix="contrail_webdav_")
+        root = tmp.name
+    Path(root).mkdir(parents=True, exist_ok=True)
+    if args.seed_from:
+        target, n = seed_root(root, args.base, args.seed_from, args.seed_copies)
+        print(f"SEEDED {n} {target}")
+    log = open(args.log, "a", encoding="utf-8") if args.log else None
+    server = Standin((args.host, args.port), root, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                     bandwidth_kbps=args.bandwidth_kbps, fail_rate=args.fail_rate, fail_methods=args.fail_methods,
+                     fault_kind=args.fault_kind, fail_status=args.fail_status, stall_s=args.stall_s,
+                     user=args.user, password=args.password, fault_seed=args.fault_seed, log=log)
+    host, port = server.server_address[:2]
+    print(f"WEBDAV_READY http://{host}:{port}/ root={server.root}", flush=True)
+    if args.duration is not None:
+        threading.Timer(args.duration, server.shutdown).start()
+    if args.bench_rounds:
+        payloads = [b.read_bytes() for b in backup_sources(args.seed_from)] or [b'{"habits": []}']
+
+        def bench():
+            try:
+                run_bench(host, port, args.base, payloads, args.bench_rounds, args.user, args.password)
+            finally:
+                server.shutdown()
+
+        threading.Thread(target=bench, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if log is not None:
+            log.close()
+        print("WEBDAV_SUMMARY " + json.dumps(summarize(server.records), ensure_ascii=False), flush=True)
+        if tmp is not None:
+            tmp.cleanup()
+
+if __name__ == "__main__":
+    main()